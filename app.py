@@ -1,258 +1,104 @@
 import streamlit as st
-import datetime
+import contextlib
+import hashlib
+import io
+import os
 import pandas as pd
 
-# ====================== FUNÇÕES AUXILIARES ======================
-def pad_numeric(value, length):
-    """Formata valor numérico com zeros à esquerda, garantindo tamanho fixo."""
-    s = str(value)
-    return s.zfill(length)[-length:]
+from cnab240 import (
+    TRANSACTION_COLUMNS,
+    Diagnostics,
+    InvalidAmountsError,
+    RetCache,
+    pad_numeric,
+    parse_centavos,
+    read_transactions_table,
+    reconcile,
+    render_transaction,
+    require_amounts,
+    ret_index,
+    stage,
+    transactions_from_table,
+    update_transaction,
+    validate_transactions,
+    write_cnab_file,
+)
 
-def pad_alfa(value, length):
-    """Formata texto com espaços à direita, truncando se necessário."""
-    s = str(value)
-    return s.ljust(length)[:length]
-
-# ====================== FUNÇÕES PARA GERAR O ARQUIVO CNAB240 (REMESSA) ======================
-def build_header_arquivo(company):
-    record = ""
-    record += pad_numeric("077", 3)                           # Código do banco (1-3)
-    record += pad_numeric("0000", 4)                          # Lote de serviço (4-7)
-    record += "0"                                             # Tipo de registro (8)
-    record += " " * 9                                         # Campo em branco (9-17)
-    record += "2"                                             # Tipo de documento (CNPJ) (18)
-    record += pad_numeric(company["cnpj"], 14)                # CNPJ (19-32)
-    record += " " * 20                                        # Campo em branco (33-52)
-    record += pad_numeric(company["agencia"], 5)              # Agência (53-57)
-    record += pad_alfa(company["agencia_dv"], 1)              # Dígito da agência (58)
-    record += pad_numeric(company["conta"], 12)               # Conta corrente (59-70)
-    record += pad_numeric(company["conta_dv"], 1)             # Dígito da conta (71)
-    record += " "                                             # Campo em branco (72)
-    record += pad_alfa(company["nome_empresa"], 30)           # Nome da empresa (73-102)
-    record += pad_alfa("BANCO INTER", 30)                     # Nome do banco (103-132)
-    record += " " * 10                                        # Campo em branco (133-142)
-    record += "1"                                             # Código de remessa (143)
-    hoje = datetime.datetime.now()
-    record += hoje.strftime("%d%m%Y")                         # Data de geração (144-151)
-    record += hoje.strftime("%H%M%S")                         # Hora de geração (152-157)
-    record += pad_numeric(company["sequencial"], 6)           # Número sequencial do arquivo (158-163)
-    record += pad_numeric("107", 3)                           # Versão do layout (164-166)
-    record += pad_numeric("01600", 5)                         # Densidade de gravação (167-171)
-    record += " " * 20                                        # Uso reservado do banco (172-191)
-    record += " " * 20                                        # Uso reservado da empresa (192-211)
-    record += " " * 29                                        # Uso exclusivo FEBRABAN/CNAB (212-240)
-    return record.ljust(240)
+# ====================== INTERFACE STREAMLIT ======================
+@st.cache_resource
+def _ret_cache():
+    """Cache de retornos analisados, compartilhado entre as execuções e sessões do app."""
+    return RetCache(loader=ret_index)
 
-def build_header_lote_pix(company):
-    record = ""
-    record += pad_numeric("077", 3)                           # Código do banco (1-3)
-    record += pad_numeric("1", 4)                             # Lote de serviço "0001" (4-7)
-    record += "1"                                             # Tipo de registro (8)
-    record += "C"                                             # Tipo de operação (9)
-    record += pad_numeric("00", 2)                            # Tipo de serviço (10-11) – default "00"
-    record += pad_numeric("45", 2)                            # Forma de lançamento PIX (12-13)
-    record += pad_numeric("046", 3)                           # Versão do layout do lote (14-16)
-    record += " "                                             # Campo em branco (17)
-    record += "2"                                             # Tipo de documento da empresa (18)
-    record += pad_numeric(company["cnpj"], 14)                # CPF/CNPJ (19-32)
-    record += " " * 20                                        # Campo em branco (33-52)
-    record += pad_numeric(company["agencia"], 5)              # Agência (53-57)
-    record += pad_alfa(company["agencia_dv"], 1)              # DV Agência (58)
-    record += pad_numeric(company["conta"], 12)               # Conta (59-70)
-    record += pad_numeric(company["conta_dv"], 1)             # DV Conta (71)
-    record += " "                                             # Campo em branco (72)
-    record += pad_alfa(company["nome_empresa"], 30)           # Nome da empresa (73-102)
-    record += pad_alfa(company.get("generica", ""), 40)       # Informação genérica opcional (103-142)
-    record += pad_alfa(company["rua"], 30)                    # Nome da Rua (143-172)
-    record += pad_numeric(company["numero"], 5)               # Número do local (173-177)
-    record += pad_alfa(company["complemento"], 15)            # Complemento (178-192)
-    record += pad_alfa(company["cidade"], 20)                 # Cidade (193-212)
-    record += pad_numeric(company["cep"], 5)                  # CEP (213-217)
-    record += " " * 3                                         # Complemento do CEP (218-220)
-    record += pad_alfa(company["estado"], 2)                  # Sigla do Estado (221-222)
-    record += " " * 8                                         # Campo em branco (223-230)
-    record += " " * 10                                        # Ocorrências para retorno (231-240)
-    return record.ljust(240)
+@st.cache_resource(max_entries=4)
+def _conciliar(chave_remessa, chave_retorno, _remessa, _retorno):
+    """Conciliação memoizada pelo SHA-256 dos dois arquivos; os bytes (parâmetros com "_") não entram na chave.
 
-def build_segmento_a_pix(transaction, seq):
-    record = ""
-    record += pad_numeric("077", 3)                           # (1-3)
-    record += pad_numeric("1", 4)                             # (4-7)
-    record += "3"                                             # (8)
-    record += pad_numeric(seq, 5)                             # (9-13)
-    record += "A"                                             # Código de segmento (14)
-    record += "0"                                             # Tipo de movimento (15)
-    record += pad_numeric("00", 2)                            # Código da instrução para movimento (16-17)
-    record += pad_numeric("000", 3)                           # Código da câmara centralizadora (18-20)
-    # Bloco de dados do favorecido – deve ocupar 53 caracteres
-    if transaction["forma_iniciacao"] == "05":
-        record += pad_numeric(transaction.get("fav_banco", ""), 3)
-        record += pad_numeric(transaction.get("fav_agencia", ""), 5)
-        record += pad_alfa(transaction.get("fav_agencia_dv", ""), 1)
-        record += pad_numeric(transaction.get("fav_conta", ""), 12)
-        record += pad_alfa(transaction.get("fav_conta_dv", ""), 1)
-        record += " "
-        record += pad_alfa(transaction.get("fav_nome", ""), 30)
-    else:
-        record += "000"
-        record += "00000"
-        record += " "
-        record += "0" * 12
-        record += " "
-        record += " " * 30
-        record += " "
-    record += pad_alfa(transaction.get("doc_empresa", ""), 20)  # (74-93)
-    date_str = transaction["data_pagamento"].strftime("%d%m%Y")  # (94-101)
-    record += date_str
-    record += pad_alfa("BRL", 3)                              # (102-104)
-    record += pad_numeric("0", 15)                            # (105-119)
-    try:
-        valor = float(transaction["valor_pagamento"].replace(",", "."))
-    except:
-        valor = 0.0
-    valor_int = int(round(valor * 100))
-    record += pad_numeric(valor_int, 15)                      # (120-134)
-    record += " " * 20                                        # Número do documento atribuído pelo banco (135-154)
-    record += " " * 8                                         # Data real da efetivação (155-162)
-    record += " " * 15                                        # Valor real da efetivação (163-177)
-    record += " " * 22                                        # Campo em branco (178-199)
-    record += pad_numeric("01", 2)                            # Tipo de conta – default "01" (200-201)
-    record += " " * 18                                        # Campo em branco (202-219)
-    record += pad_numeric("00010", 5)                         # Código finalidade – default "00010" (220-224)
-    record += " " * 6                                         # Campo em branco (225-230)
-    record += " " * 10                                        # Ocorrências para retorno (231-240)
-    return record.ljust(240)
+    Os DataFrames devolvidos são compartilhados entre execuções e não devem ser alterados.
+    """
+    return reconcile(_remessa, _retorno)
 
-def build_segmento_b_pix(transaction, seq):
-    record = ""
-    record += pad_numeric("077", 3)                           
-    record += pad_numeric("1", 4)                             
-    record += "3"                                             
-    record += pad_numeric(seq, 5)                             
-    record += "B"                                             
-    record += pad_alfa(transaction["forma_iniciacao"], 3)     
-    record += pad_numeric(transaction["tipo_doc_fav"], 1)       
-    record += pad_numeric(transaction["doc_fav"], 14)         
-    record += pad_alfa(transaction["txid"], 35)               
-    record += " " * 60                                        
-    if transaction["forma_iniciacao"] in ["01", "02", "04"]:
-        record += pad_alfa(transaction["chave_pix"], 99)      
-    else:
-        record += " " * 99                                    
-    record += " " * 6                                         
-    if transaction["fav_ispb"]:
-        record += pad_numeric(transaction["fav_ispb"], 8)     
-    else:
-        record += pad_numeric("0", 8)
-    return record.ljust(240)
+def _adicionar_transacoes(novas):
+    """Adiciona transações à sessão já com seus Segmentos A/B renderizados na posição final.
 
-def build_trailer_lote(n_transacoes, total_valor):
-    record = ""
-    record += pad_numeric("077", 3)
-    record += pad_numeric("1", 4)
-    record += "5"
-    record += " " * 9
-    registros_lote = 2 * n_transacoes + 2
-    record += pad_numeric(registros_lote, 6)
-    total_cents = int(round(total_valor * 100))
-    record += pad_numeric(total_cents, 18)
-    record += pad_numeric("0", 18)
-    record += " " * 6
-    record += " " * 165
-    record += " " * 10
-    return record.ljust(240)
+    Os valores são convertidos em lote; se algum for inválido, nenhuma transação é adicionada.
+    """
+    centavos = require_amounts([t["valor_pagamento"] for t in novas])
+    transactions = st.session_state.transactions
+    for t, c in zip(novas, centavos):
+        render_transaction(t, 2 * len(transactions) + 1, c)
+        transactions.append(t)
 
-def build_trailer_arquivo(total_lotes, total_registros):
-    record = ""
-    record += pad_numeric("077", 3)
-    record += pad_numeric("9999", 4)
-    record += "9"
-    record += " " * 9
-    record += pad_numeric(total_lotes, 6)
-    record += pad_numeric(total_registros, 6)
-    record += " " * (240 - (3+4+1+9+6+6))
-    return record.ljust(240)
+@contextlib.contextmanager
+def _medir(operacao):
+    """Mede a operação se o diagnóstico estiver ligado.
 
-def generate_cnab_file(company, transactions):
-    lines = []
-    header_arquivo = build_header_arquivo(company)
-    lines.append(header_arquivo)
-    header_lote = build_header_lote_pix(company)
-    lines.append(header_lote)
-    seq = 1
-    total_valor = 0.0
-    for t in transactions:
-        seg_a = build_segmento_a_pix(t, seq)
-        lines.append(seg_a)
-        seq += 1
-        seg_b = build_segmento_b_pix(t, seq)
-        lines.append(seg_b)
-        seq += 1
-        try:
-            valor = float(t["valor_pagamento"].replace(",", "."))
-        except:
-            valor = 0.0
-        total_valor += valor
-    trailer_lote = build_trailer_lote(len(transactions), total_valor)
-    lines.append(trailer_lote)
-    total_registros = 1 + 1 + (2 * len(transactions)) + 1 + 1
-    trailer_arquivo = build_trailer_arquivo(1, total_registros)
-    lines.append(trailer_arquivo)
-    return "\n".join(lines)
+    As métricas vão para CNAB240_METRICS_FILE (se definido) assim que a operação termina, antes
+    de um eventual st.rerun() interromper o script.
+    """
+    if not st.session_state.get("diag_ativo"):
+        yield None
+        return
+    diag = Diagnostics(operacao, profile=st.session_state.get("diag_perfil", False))
+    historico = st.session_state.setdefault("diagnosticos", [])
+    historico.append(diag)
+    del historico[:-20]
+    try:
+        with diag:
+            yield diag
+    finally:
+        destino = os.environ.get("CNAB240_METRICS_FILE")
+        if destino:
+            diag.write_jsonl(destino)
 
-# ====================== FUNÇÃO PARA IMPORTAR E PARSER O ARQUIVO RETORNO (.RET) ======================
-def parse_ret_file(text):
-    # Garante que cada linha tenha 240 caracteres
-    lines = [line if len(line) >= 240 else line.ljust(240) for line in text.splitlines() if line.strip()]
-    registros = []
-    for line in lines:
-        tipo_registro = line[7:8]
-        # Processa apenas registros de detalhe (tipo "3") e, dentro destes, apenas os Segmento A
-        if tipo_registro == "3":
-            segmento = line[13:14]
-            if segmento == "A":
-                reg = {}
-                reg["Código Banco"] = line[0:3].strip()
-                reg["Lote"] = line[3:7].strip()
-                reg["Tipo Registro"] = line[7:8].strip()
-                reg["Segmento"] = segmento
-                reg["Tipo Movimento"] = line[14:15].strip()
-                reg["Instrução Movimento"] = line[15:17].strip()
-                reg["Câmara Centralizadora"] = line[17:20].strip()
-                reg["Doc Empresa"] = line[73:93].strip()        # (pos. 74-93)
-                reg["Data Pagamento"] = line[93:101].strip()      # (pos. 94-101)
-                reg["Moeda"] = line[101:104].strip()              # (pos. 102-104)
-                reg["Qtde Moeda"] = line[104:119].strip()         # (pos. 105-119)
-                nominal_str = line[119:134].strip()              # (pos. 120-134)
-                try:
-                    nominal_val = int(nominal_str)
-                except:
-                    nominal_val = 0
-                reg["Valor Nominal (R$)"] = nominal_val / 100.0
-                reg["Doc Banco"] = line[134:154].strip()          # (pos. 135-154)
-                reg["Data Efetivação"] = line[154:162].strip()      # (pos. 155-162)
-                efetivo_str = line[162:177].strip()               # (pos. 163-177)
-                try:
-                    efetivo_val = int(efetivo_str)
-                except:
-                    efetivo_val = 0
-                reg["Valor Efetivo (R$)"] = efetivo_val / 100.0
-                # Campo em branco (pos. 178-199) ignorado
-                reg["Tipo de Conta"] = line[199:201].strip()       # (pos. 200-201)
-                # Campo em branco (202-219) ignorado
-                reg["Código Finalidade"] = line[219:224].strip()   # (pos. 220-224)
-                # Campo em branco (225-230) ignorado
-                reg["Ocorrência"] = line[230:240].strip()          # (pos. 231-240)
-                # Define Status com base na Data Efetivação (se diferente de "00000000")
-                if reg["Data Efetivação"] and reg["Data Efetivação"] != "00000000":
-                    reg["Status"] = "Pago"
-                else:
-                    reg["Status"] = "Não Pago"
-                registros.append(reg)
-    return registros
+def _painel_diagnostico():
+    """Preenche o painel de diagnóstico da barra lateral com as últimas operações medidas."""
+    historico = st.session_state.get("diagnosticos", [])
+    if not historico:
+        st.caption("Nenhuma operação medida ainda." if st.session_state.get("diag_ativo") else
+                   "Ative para medir tempo e registros de cada etapa.")
+        return
+    ultima = historico[-1]
+    st.caption(f"Última operação: {ultima.operacao} em {ultima.segundos:.3f} s")
+    etapas = pd.DataFrame([r for diag in reversed(historico) for r in diag.records()])
+    etapas["etapa"] = ["  " * n + e for n, e in zip(etapas["nivel"], etapas["etapa"])]
+    st.dataframe(etapas[["operacao", "etapa", "segundos", "registros"]], hide_index=True)
+    st.download_button("Métricas (JSON lines)", data="".join(diag.to_jsonl() for diag in historico),
+                       file_name="cnab240_metricas.jsonl", mime="application/x-ndjson")
+    perfilado = next((diag for diag in reversed(historico) if diag.perfil), None)
+    if perfilado is not None:
+        st.caption(f"Perfil de {perfilado.operacao} · pico de memória "
+                   f"{perfilado.pico_memoria / 2**20:.1f} MB")
+        st.code(perfilado.perfil, language=None)
+    if st.button("Limpar diagnóstico"):
+        historico.clear()
+        st.rerun()
 
-# ====================== INTERFACE STREAMLIT ======================
-menu = st.sidebar.radio("Selecione a funcionalidade", ["Gerar Remessa", "Importar Retorno"])
+menu = st.sidebar.radio("Selecione a funcionalidade", ["Gerar Remessa", "Importar Retorno", "Conciliação"])
+painel_diagnostico = st.sidebar.expander("Diagnóstico")
+painel_diagnostico.checkbox("Medir etapas", key="diag_ativo")
+painel_diagnostico.checkbox("Capturar perfil (cProfile/tracemalloc)", key="diag_perfil",
+                            disabled=not st.session_state.get("diag_ativo"))
 
 if menu == "Gerar Remessa":
     st.title("Gerador de Arquivo CNAB240 - Pagamentos via PIX")
@@ -323,35 +169,112 @@ if menu == "Gerar Remessa":
         fav_ispb = st.text_input("Código ISPB do Favorecido (8 dígitos, opcional)", value="")
         submitted_trans = st.form_submit_button("Adicionar Transação")
         if submitted_trans:
-            st.session_state.transactions.append({
-                "data_pagamento": data_pagamento,
-                "valor_pagamento": valor_pagamento,
-                "doc_empresa": doc_empresa,
-                "forma_iniciacao": forma_iniciacao.split(" - ")[0],
-                "fav_banco": fav_banco,
-                "fav_agencia": fav_agencia,
-                "fav_agencia_dv": fav_agencia_dv,
-                "fav_conta": fav_conta,
-                "fav_conta_dv": fav_conta_dv,
-                "fav_nome": fav_nome,
-                "tipo_doc_fav": tipo_doc_fav.split(" - ")[0],
-                "doc_fav": doc_fav,
-                "txid": txid,
-                "chave_pix": chave_pix,
-                "fav_ispb": fav_ispb
-            })
-            st.success("Transação adicionada!")
+            try:
+                _adicionar_transacoes([{
+                    "data_pagamento": data_pagamento,
+                    "valor_pagamento": valor_pagamento,
+                    "doc_empresa": doc_empresa,
+                    "forma_iniciacao": forma_iniciacao.split(" - ")[0],
+                    "fav_banco": fav_banco,
+                    "fav_agencia": fav_agencia,
+                    "fav_agencia_dv": fav_agencia_dv,
+                    "fav_conta": fav_conta,
+                    "fav_conta_dv": fav_conta_dv,
+                    "fav_nome": fav_nome,
+                    "tipo_doc_fav": tipo_doc_fav.split(" - ")[0],
+                    "doc_fav": doc_fav,
+                    "txid": txid,
+                    "chave_pix": chave_pix,
+                    "fav_ispb": fav_ispb
+                }])
+            except InvalidAmountsError:
+                st.error("Valor do pagamento inválido (use 1234,56).")
+            else:
+                st.success("Transação adicionada!")
     
+    st.markdown("### Importar Transações em Lote (CSV/XLSX)")
+    st.caption("Uma transação por linha, com as colunas: " + ", ".join(TRANSACTION_COLUMNS))
+    planilha = st.file_uploader("Escolha a planilha de transações", type=["csv", "xlsx"])
+    if planilha is not None:
+        with _medir("importar_planilha"):
+            try:
+                with stage("planilha.leitura") as etapa:
+                    lote = read_transactions_table(planilha, planilha.name)
+                    etapa["registros"] = len(lote)
+            except ValueError as e:
+                st.error(str(e))
+                lote = None
+            if lote is not None:
+                with stage("planilha.validacao", len(lote)):
+                    erros = validate_transactions(lote)
+        if lote is not None:
+            if len(erros):
+                st.error(f"{len(erros)} problema(s) encontrados na planilha. Corrija e envie novamente.")
+                st.dataframe(erros, hide_index=True)
+            elif st.session_state.get("planilha_adicionada") == planilha.file_id:
+                # O uploader continua com o arquivo: sem o botão, um novo clique não duplica o lote
+                st.success(f"{len(lote)} transações desta planilha adicionadas!")
+            else:
+                st.info(f"{len(lote)} transações válidas na planilha.")
+                if st.button("Adicionar Transações da Planilha"):
+                    with _medir("adicionar_planilha"), stage("planilha.adicionar", len(lote)):
+                        _adicionar_transacoes(transactions_from_table(lote))
+                    st.session_state.planilha_adicionada = planilha.file_id
+                    st.rerun()
+
     if st.session_state.get("transactions"):
         st.markdown("### Transações Adicionadas")
-        for i, trans in enumerate(st.session_state.transactions):
-            st.write(f"Transação {i+1}: Data: {trans['data_pagamento']}, Valor: {trans['valor_pagamento']}, Forma: {trans['forma_iniciacao']}")
-            
+        transactions = st.session_state.transactions
+        # Só as colunas exibidas: os registros guardados (_registros) não entram no DataFrame
+        resumo = pd.DataFrame(transactions,
+                              columns=["data_pagamento", "valor_pagamento", "forma_iniciacao", "doc_fav", "doc_empresa"])
+        resumo.columns = ["Data", "Valor", "Forma", "Doc Favorecido", "Doc Empresa"]
+        resumo.index = range(1, len(resumo) + 1)
+        st.dataframe(resumo)
+
+        # Um único campo numérico escolhe a linha, em vez de widgets com uma opção por transação
+        if st.session_state.get("linha_transacao", 1) > len(transactions):
+            st.session_state.linha_transacao = len(transactions)
+        linha = st.number_input("Transação (nº da linha)", min_value=1, max_value=len(transactions), step=1,
+                                key="linha_transacao")
+        t = transactions[linha - 1]
+        if st.button(f"Remover Transação {linha}"):
+            # As seguintes são renumeradas na geração; seus registros guardados continuam válidos
+            del transactions[linha - 1]
+            st.rerun()
+
+        with st.expander(f"Editar Transação {linha}"):
+            sufixo = f"{linha}_{id(t)}"
+            with st.form(f"editar_transacao_{sufixo}"):
+                data_pagamento = st.date_input("Data do Pagamento", value=t["data_pagamento"],
+                                               key=f"editar_data_{sufixo}")
+                valor_pagamento = st.text_input("Valor do Pagamento (ex.: 1234,56)", value=t["valor_pagamento"],
+                                                key=f"editar_valor_{sufixo}")
+                doc_empresa = st.text_input("Número do Documento atribuído para a empresa (opcional)",
+                                            value=t["doc_empresa"], key=f"editar_doc_{sufixo}")
+                chave_pix = st.text_input("Chave PIX (se aplicável para tipos 01, 02 ou 04)", value=t["chave_pix"],
+                                          key=f"editar_chave_{sufixo}")
+                txid = st.text_input("TX ID (opcional)", value=t["txid"], key=f"editar_txid_{sufixo}")
+                if st.form_submit_button("Salvar Alterações"):
+                    try:
+                        parse_centavos(valor_pagamento)
+                    except InvalidAmountsError:
+                        st.error("Valor do pagamento inválido (use 1234,56).")
+                    else:
+                        # Descarta os registros guardados; são renderizados de novo na próxima geração
+                        update_transaction(t, data_pagamento=data_pagamento, valor_pagamento=valor_pagamento,
+                                           doc_empresa=doc_empresa, chave_pix=chave_pix, txid=txid)
+                        st.rerun()
+
         if st.button("Gerar Arquivo .REM"):
             if "company" not in st.session_state:
                 st.error("Por favor, preencha os dados da empresa primeiro.")
             else:
-                arquivo = generate_cnab_file(st.session_state.company, st.session_state.transactions)
+                arquivo = io.BytesIO()
+                with _medir("gerar_remessa"):
+                    write_cnab_file(st.session_state.company, st.session_state.transactions, arquivo,
+                                    encoding="utf-8", cache_records=True)
+                arquivo.seek(0)
                 file_name = f"CI240_001_{pad_numeric(st.session_state.company['sequencial'], 4)}.rem"
                 st.download_button("Download do Arquivo .REM", data=arquivo, file_name=file_name, mime="text/plain")
 
@@ -359,14 +282,75 @@ elif menu == "Importar Retorno":
     st.title("Importar Arquivo Retorno (.RET)")
     uploaded_file = st.file_uploader("Escolha o arquivo .RET", type=["ret"])
     if uploaded_file is not None:
-        file_bytes = uploaded_file.read()
-        try:
-            text = file_bytes.decode("utf-8")
-        except UnicodeDecodeError:
-            text = file_bytes.decode("latin1")
-        registros = parse_ret_file(text)
-        if registros:
-            df = pd.DataFrame(registros)
-            st.dataframe(df)
-        else:
-            st.warning("Nenhum registro detalhado (Segmento A) encontrado no arquivo.")
+        with _medir("importar_retorno"):
+            cache = _ret_cache()
+            with stage("retorno.carregar") as etapa:
+                indice, hit = cache.get_or_parse(uploaded_file.getvalue())
+                etapa.update(registros=len(indice), cache="acerto" if hit else "falha")
+            st.sidebar.caption(
+                f"Cache de retorno: {'acerto' if hit else 'falha'} nesta leitura · "
+                f"{cache.hits} acertos / {cache.misses} falhas · {len(cache)} arquivo(s) em cache"
+            )
+            if len(indice):
+                st.markdown("### Filtros")
+                col1, col2 = st.columns(2)
+                status = col1.multiselect("Status", options=indice.categories("Status"))
+                ocorrencias = col2.multiselect("Ocorrência", options=indice.categories("Ocorrência"),
+                                               format_func=lambda o: o or "(em branco)")
+                col1, col2 = st.columns(2)
+                doc_empresa = col1.text_input("Doc Empresa (início do número)")
+                periodo = col2.date_input("Data Efetivação (período)", value=())
+                data_inicio = periodo[0] if len(periodo) > 0 else None
+                data_fim = periodo[1] if len(periodo) > 1 else data_inicio
+                with stage("retorno.filtro") as etapa:
+                    posicoes = indice.filter(status=status, ocorrencias=ocorrencias, data_inicio=data_inicio,
+                                             data_fim=data_fim, doc_empresa=doc_empresa.strip())
+                    etapa["registros"] = len(posicoes)
+
+                st.markdown("### Resumo por Data de Pagamento")
+                with stage("retorno.resumo", len(posicoes)):
+                    st.dataframe(indice.summary(posicoes), hide_index=True)
+
+                st.markdown(f"### Registros ({len(posicoes)} de {len(indice)})")
+                col1, col2 = st.columns(2)
+                tamanho = col1.selectbox("Registros por página", options=[50, 100, 500, 1000], index=1)
+                paginas = max(1, -(-len(posicoes) // tamanho))
+                pagina = col2.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1)
+                with stage("retorno.exibir", min(tamanho, len(posicoes))):
+                    st.dataframe(indice.page(posicoes, pagina, tamanho))
+            else:
+                st.warning("Nenhum registro detalhado (Segmento A) encontrado no arquivo.")
+
+elif menu == "Conciliação":
+    st.title("Conciliação Remessa x Retorno")
+    col1, col2 = st.columns(2)
+    arquivo_rem = col1.file_uploader("Arquivo de remessa (.REM)", type=["rem"])
+    arquivo_ret = col2.file_uploader("Arquivo de retorno (.RET)", type=["ret"])
+    if arquivo_rem is not None and arquivo_ret is not None:
+        remessa, retorno = arquivo_rem.getvalue(), arquivo_ret.getvalue()
+        with _medir("conciliacao"), stage("conciliacao.cruzamento") as etapa:
+            # Filtros e demais widgets reexecutam o script; o cruzamento só roda para um par de arquivos novo
+            conciliacao, sem_remessa = _conciliar(hashlib.sha256(remessa).hexdigest(),
+                                                  hashlib.sha256(retorno).hexdigest(), remessa, retorno)
+            etapa["registros"] = len(conciliacao)
+        contagem = conciliacao["Situação"].value_counts()
+        colunas = st.columns(len(contagem) + 1)
+        for coluna, (situacao, quantidade) in zip(colunas, contagem.items()):
+            coluna.metric(situacao, quantidade)
+        colunas[-1].metric("Sem remessa", len(sem_remessa))
+        situacoes = st.multiselect("Situação", options=list(contagem.index),
+                                   default=[s for s in contagem.index if s != "Pago"])
+        filtrado = conciliacao[conciliacao["Situação"].isin(situacoes)]
+        st.markdown(f"### Pagamentos ({len(filtrado)})")
+        st.dataframe(filtrado.head(1000), hide_index=True)
+        if len(filtrado) > 1000:
+            st.caption("Exibindo os 1000 primeiros; baixe o CSV para a lista completa.")
+        # O CSV só é montado quando o botão é clicado
+        st.download_button("Download da Conciliação (CSV)", data=lambda: filtrado.to_csv(index=False, sep=";"),
+                           file_name="conciliacao.csv", mime="text/csv")
+        if len(sem_remessa):
+            st.markdown(f"### Registros do retorno sem correspondência na remessa ({len(sem_remessa)})")
+            st.dataframe(sem_remessa.head(1000), hide_index=True)
+
+with painel_diagnostico:
+    _painel_diagnostico()
@@ -0,0 +1,32 @@
+"""Curva de escala da geração de remessa com ProcessPoolExecutor.
+
+Uso: python benchmarks/bench_parallel.py [--n 1000000] [--workers 1,2,4,8]
+"""
+import argparse
+import io
+import os
+import time
+
+from synthetic import COMPANY, synthetic_transactions  # também põe a raiz do repositório no sys.path
+
+from cnab240 import write_cnab_file
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    args = parser.parse_args()
+
+    transactions = synthetic_transactions(args.n)
+    print(f"{args.n} transações, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'segundos':>9} {'registros/s':>12} {'speedup':>8}")
+    serial = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        inicio = time.perf_counter()
+        write_cnab_file(COMPANY, transactions, io.StringIO(), workers=workers)
+        tempo = time.perf_counter() - inicio
+        serial = serial or tempo
+        print(f"{workers:>8} {tempo:>9.2f} {2 * args.n / tempo:>12,.0f} {serial / tempo:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
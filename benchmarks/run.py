@@ -0,0 +1,109 @@
+"""Benchmarks de geração de remessa, parser de retorno e montagem do DataFrame.
+
+Uso:
+    python benchmarks/run.py [--sizes 1000,100000,1000000] [--save baseline.json] [--compare baseline.json]
+
+Para cada caso e tamanho mede registros/s (melhor de --repeat execuções) e o pico de memória
+alocada (tracemalloc, em uma execução separada para não distorcer o tempo). Com --compare,
+termina com código 1 se algum caso ficar mais lento ou usar mais memória que a tolerância.
+"""
+import argparse
+import gc
+import io
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+
+from synthetic import COMPANY, synthetic_ret, synthetic_transactions  # também põe a raiz do repositório no sys.path
+
+from cnab240 import decode_ret_bytes, parse_ret_columns, parse_ret_file, parse_ret_stream, ret_dataframe, write_cnab_file
+
+# caso -> (função que recebe os dados preparados, quantos registros ela processa)
+CASES = {
+    "geracao": (lambda d: write_cnab_file(COMPANY, d["transactions"], io.StringIO()), lambda d: 2 * len(d["transactions"])),
+    "parse_ret_file": (lambda d: parse_ret_file(decode_ret_bytes(d["ret"])), lambda d: d["linhas_ret"]),
+    "parse_ret_columns": (lambda d: parse_ret_columns(decode_ret_bytes(d["ret"])), lambda d: d["linhas_ret"]),
+    "parse_ret_stream": (lambda d: parse_ret_stream(d["ret"]), lambda d: d["linhas_ret"]),
+    "dataframe_legado": (lambda d: pd.DataFrame(parse_ret_file(decode_ret_bytes(d["ret"]))), lambda d: d["linhas_ret"]),
+    "dataframe": (lambda d: ret_dataframe(d["ret"]), lambda d: d["linhas_ret"]),
+}
+
+def prepare(n, seed=0):
+    transactions = synthetic_transactions(n, seed)
+    ret = synthetic_ret(transactions, seed)
+    return {"transactions": transactions, "ret": ret, "linhas_ret": ret.count(b"\n") + 1}
+
+def measure(funcao, dados, repeat, memoria):
+    melhor = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao(dados)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    pico = None
+    if memoria:
+        gc.collect()
+        tracemalloc.start()
+        funcao(dados)
+        pico = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return melhor, pico
+
+def compare(resultados, baseline, tolerancia):
+    """Imprime a variação contra o baseline e devolve a lista de regressões."""
+    regressoes = []
+    print(f"\n{'caso':<28} {'registros/s':>12} {'pico MB':>9}")
+    for chave, atual in resultados.items():
+        anterior = baseline.get(chave)
+        if anterior is None:
+            continue
+        vel = atual["registros_s"] / anterior["registros_s"] - 1
+        linha = f"{chave:<28} {vel:>+11.1%}"
+        if vel < -tolerancia:
+            regressoes.append(f"{chave}: {vel:+.1%} registros/s")
+        if atual.get("pico_mb") and anterior.get("pico_mb"):
+            mem = atual["pico_mb"] / anterior["pico_mb"] - 1
+            linha += f" {mem:>+8.1%}"
+            if mem > tolerancia:
+                regressoes.append(f"{chave}: {mem:+.1%} de memória")
+        print(linha)
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--cases", default=",".join(CASES), help="casos separados por vírgula")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--save", metavar="ARQUIVO", help="grava os resultados como baseline (JSON)")
+    parser.add_argument("--compare", metavar="ARQUIVO", help="compara com um baseline gravado antes")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="variação aceita no --compare")
+    args = parser.parse_args()
+
+    resultados = {}
+    print(f"{'caso':<20} {'n':>9} {'segundos':>9} {'registros/s':>12} {'pico MB':>9}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        dados = prepare(n)
+        for caso in args.cases.split(","):
+            funcao, registros = CASES[caso]
+            segundos, pico = measure(funcao, dados, args.repeat, not args.no_memory)
+            taxa = registros(dados) / segundos
+            resultados[f"{caso}@{n}"] = {"segundos": segundos, "registros_s": taxa, "pico_mb": pico}
+            pico_txt = f"{pico:>9.1f}" if pico is not None else f"{'-':>9}"
+            print(f"{caso:<20} {n:>9} {segundos:>9.3f} {taxa:>12,.0f} {pico_txt}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\nBaseline gravado em {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressoes = compare(resultados, json.load(f), args.tolerance)
+        if regressoes:
+            print("\nRegressões acima da tolerância:\n  " + "\n  ".join(regressoes))
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
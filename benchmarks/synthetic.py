@@ -0,0 +1,73 @@
+"""Dados sintéticos para os benchmarks: empresa, transações PIX e arquivos de retorno (.RET)."""
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cnab240 import generate_cnab_file  # noqa: E402
+
+COMPANY = {
+    "cnpj": "12345678000199", "agencia": "00001", "agencia_dv": "9", "conta": "123456",
+    "conta_dv": "7", "nome_empresa": "EMPRESA TESTE LTDA", "rua": "RUA A", "numero": "10",
+    "complemento": "SALA 1", "cidade": "SAO PAULO", "cep": "01234", "estado": "SP",
+    "generica": "", "sequencial": "0001",
+}
+
+# Ocorrências de rejeição usadas nos retornos sintéticos
+OCORRENCIAS_REJEICAO = ["AB", "AG", "AM", "AN", "BG"]
+
+def _chave_pix(rnd, forma, i):
+    if forma == "01":
+        return f"+55{rnd.randint(11, 99)}9{rnd.randint(0, 10**8 - 1):08d}"
+    if forma == "02":
+        return f"favorecido{i}@exemplo.com.br"
+    if forma == "04":
+        return "%08x-%04x-%04x-%04x-%012x" % tuple(rnd.getrandbits(b) for b in (32, 16, 16, 16, 48))
+    return ""
+
+def synthetic_transactions(n, seed=0):
+    """n transações cobrindo as cinco formas de iniciação, com valores e chaves aleatórios."""
+    rnd = random.Random(seed)
+    base = datetime.date.today()
+    transactions = []
+    for i in range(n):
+        forma = rnd.choice(["01", "02", "03", "04", "05"])
+        bancario = forma == "05"
+        tipo_doc = rnd.choice(["1", "2"])
+        transactions.append({
+            "data_pagamento": base + datetime.timedelta(days=rnd.randint(0, 30)),
+            "valor_pagamento": f"{rnd.randint(1, 99999)},{rnd.randint(0, 99):02d}",
+            "doc_empresa": f"DOC{i:010d}",
+            "forma_iniciacao": forma,
+            "fav_banco": f"{rnd.randint(1, 999):03d}" if bancario else "",
+            "fav_agencia": str(rnd.randint(1, 9999)) if bancario else "",
+            "fav_agencia_dv": str(rnd.randint(0, 9)) if bancario else "",
+            "fav_conta": str(rnd.randint(1, 10**8)) if bancario else "",
+            "fav_conta_dv": str(rnd.randint(0, 9)) if bancario else "",
+            "fav_nome": f"FAVORECIDO {i}" if bancario else "",
+            "tipo_doc_fav": tipo_doc,
+            "doc_fav": f"{rnd.randint(0, 10**11 - 1):011d}" if tipo_doc == "1" else f"{rnd.randint(0, 10**14 - 1):014d}",
+            "txid": f"TX{i:030d}" if rnd.random() < 0.5 else "",
+            "chave_pix": _chave_pix(rnd, forma, i),
+            "fav_ispb": f"{rnd.randint(0, 10**8 - 1):08d}" if rnd.random() < 0.3 else "",
+        })
+    return transactions
+
+def synthetic_ret(transactions, seed=0, pagos=0.7, rejeitados=0.1):
+    """Retorno (bytes, CRLF) da remessa dessas transações, com pagos, não pagos e rejeitados."""
+    rnd = random.Random(seed)
+    linhas = []
+    for linha in generate_cnab_file(COMPANY, transactions).split("\n"):
+        if linha[7] == "3" and linha[13] == "A":
+            sorteio = rnd.random()
+            if sorteio < rejeitados:
+                efetivacao, efetivo, ocorrencia = "00000000", "0" * 15, rnd.choice(OCORRENCIAS_REJEICAO)
+            elif sorteio < rejeitados + pagos:
+                efetivacao, efetivo, ocorrencia = linha[93:101], linha[119:134], "00"
+            else:
+                efetivacao, efetivo, ocorrencia = "00000000", "0" * 15, "BD"
+            linha = linha[:134] + f"E2E{rnd.getrandbits(64):017d}"[:20] + efetivacao + efetivo + linha[177:230] + ocorrencia.ljust(10)
+        linhas.append(linha)
+    return "\r\n".join(linhas).encode("latin1")
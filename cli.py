@@ -0,0 +1,139 @@
+"""Modo em lote, sem Streamlit: gera remessas a partir de planilhas e converte retornos.
+
+Exemplos:
+    python cli.py remessa --empresa empresa.json planilhas/ -o remessas/
+    python cli.py retorno retornos/ -o convertidos/ --formato parquet --metricas metricas.jsonl
+
+Cada entrada pode ser um arquivo ou um diretório (os arquivos com a extensão esperada dentro
+dele são processados). Os arquivos são processados em paralelo por um pool de processos; com
+um único arquivo de remessa, o pool renderiza as transações dele em fatias.
+Com --metricas, o tempo e os registros de cada etapa são acrescentados ao arquivo em JSON lines.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+EXTENSOES = {"remessa": (".csv", ".xlsx"), "retorno": (".ret",)}
+EMPRESA_CAMPOS = [
+    "cnpj", "agencia", "agencia_dv", "conta", "conta_dv", "nome_empresa", "rua", "numero",
+    "complemento", "cidade", "cep", "estado", "sequencial",
+]
+
+def listar_arquivos(entradas, extensoes):
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            arquivos.extend(
+                os.path.join(entrada, nome) for nome in sorted(os.listdir(entrada))
+                if nome.lower().endswith(extensoes) and os.path.isfile(os.path.join(entrada, nome))
+            )
+        else:
+            arquivos.append(entrada)
+    return arquivos
+
+def _saida(entrada, diretorio, extensao):
+    nome = os.path.splitext(os.path.basename(entrada))[0] + extensao
+    return os.path.join(diretorio or os.path.dirname(entrada), nome)
+
+def gerar_remessa(entrada, diretorio, company, workers=1):
+    """Planilha CSV/XLSX -> .REM. Devolve (mensagem, ok).
+
+    Com `workers` > 1, os detalhes de planilhas grandes são renderizados em paralelo (ver write_cnab_file).
+    """
+    from cnab240 import (read_transactions_table, stage, transactions_from_table, validate_transactions,
+                         write_cnab_file)
+
+    with stage("planilha.leitura") as etapa:
+        lote = read_transactions_table(entrada, entrada)
+        etapa["registros"] = len(lote)
+    with stage("planilha.validacao", len(lote)):
+        erros = validate_transactions(lote)
+    if len(erros):
+        detalhes = "; ".join(f"linha {e.Linha} {e.Campo}: {e.Erro}" for e in erros.head(10).itertuples())
+        return f"{entrada}: {len(erros)} problema(s) na planilha ({detalhes})", False
+    saida = _saida(entrada, diretorio, ".rem")
+    with open(saida, "wb") as f:
+        totais = write_cnab_file(company, transactions_from_table(lote), f, encoding="utf-8", workers=workers)
+    return f"{entrada} -> {saida} ({totais['transacoes']} transações, {totais['registros']} registros)", True
+
+def converter_retorno(entrada, diretorio, formato):
+    """.RET -> CSV ou Parquet. Devolve (mensagem, ok)."""
+    from cnab240 import ret_dataframe, stage
+
+    df = ret_dataframe(entrada)
+    saida = _saida(entrada, diretorio, "." + formato)
+    with stage("retorno.gravar", len(df)):
+        if formato == "parquet":
+            df.to_parquet(saida, index=False)
+        else:
+            df.to_csv(saida, index=False, sep=";")
+    return f"{entrada} -> {saida} ({len(df)} registros)", True
+
+def _executar(tarefa, entrada, metricas, *args):
+    """Executa a tarefa de um arquivo. Devolve (mensagem, ok, métricas em JSON lines ou "")."""
+    if not metricas:
+        return (*_tentar(tarefa, entrada, *args), "")
+    from cnab240 import Diagnostics
+
+    with Diagnostics(tarefa.__name__, arquivo=entrada) as diag:
+        mensagem, ok = _tentar(tarefa, entrada, *args)
+    return mensagem, ok, diag.to_jsonl()
+
+def _tentar(tarefa, entrada, *args):
+    try:
+        return tarefa(entrada, *args)
+    except (OSError, ValueError, KeyError) as e:
+        return f"{entrada}: erro: {e}", False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="comando", required=True)
+    rem = sub.add_parser("remessa", help="gera arquivos .REM a partir de planilhas CSV/XLSX")
+    rem.add_argument("--empresa", required=True, help="JSON com os dados da empresa (mesmos campos do app)")
+    ret = sub.add_parser("retorno", help="converte arquivos .RET em CSV ou Parquet")
+    ret.add_argument("--formato", choices=["csv", "parquet"], default="csv")
+    for p in (rem, ret):
+        p.add_argument("entradas", nargs="+", help="arquivos ou diretórios de entrada")
+        p.add_argument("-o", "--saida", help="diretório de saída (padrão: o mesmo da entrada)")
+        p.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                       help="processos: um arquivo por processo ou, com um único arquivo de remessa, "
+                            "fatias das transações")
+        p.add_argument("--metricas", help="arquivo JSON lines onde acrescentar as métricas de cada etapa")
+    args = parser.parse_args(argv)
+
+    if args.comando == "remessa":
+        with open(args.empresa, encoding="utf-8") as f:
+            company = json.load(f)
+        faltando = [c for c in EMPRESA_CAMPOS if c not in company]
+        if faltando:
+            parser.error(f"campos ausentes em {args.empresa}: {', '.join(faltando)}")
+        tarefa, extras = gerar_remessa, (args.metricas, args.saida, company)
+    else:
+        tarefa, extras = converter_retorno, (args.metricas, args.saida, args.formato)
+    if args.saida:
+        os.makedirs(args.saida, exist_ok=True)
+
+    arquivos = listar_arquivos(args.entradas, EXTENSOES[args.comando])
+    if args.workers > 1 and len(arquivos) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(arquivos))) as pool:
+            resultados = list(pool.map(_executar, [tarefa] * len(arquivos), arquivos,
+                                       *[[extra] * len(arquivos) for extra in extras]))
+    else:
+        # Um arquivo por vez: na remessa, os processos ficam com as fatias de transações do arquivo
+        if tarefa is gerar_remessa:
+            extras += (args.workers,)
+        resultados = [_executar(tarefa, arquivo, *extras) for arquivo in arquivos]
+
+    falhas = 0
+    for mensagem, ok, _ in resultados:
+        print(mensagem, file=sys.stdout if ok else sys.stderr)
+        falhas += not ok
+    if args.metricas:
+        with open(args.metricas, "a", encoding="utf-8") as f:
+            f.writelines(linhas for _, _, linhas in resultados)
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
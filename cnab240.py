@@ -0,0 +1,1030 @@
+import datetime
+import functools
+import hashlib
+import io
+import json
+import mmap
+import numbers
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+# ====================== FUNÇÕES AUXILIARES ======================
+def pad_numeric(value, length):
+    """Formata valor numérico com zeros à esquerda, garantindo tamanho fixo."""
+    s = str(value)
+    return s.zfill(length)[-length:]
+
+def pad_alfa(value, length):
+    """Formata texto com espaços à direita, truncando se necessário."""
+    s = str(value)
+    return s.ljust(length)[:length]
+
+# Valor digitado: até 13 dígitos inteiros (o campo tem 15 posições em centavos) e até 2 decimais,
+# separados por "," ou "."; sem sinal nem separador de milhar. Os grupos são os inteiros e cada decimal.
+VALOR_PATTERN = r"\s*([0-9]{1,13})(?:[.,]([0-9])([0-9])?)?\s*"
+_VALOR_RE = re.compile(VALOR_PATTERN)
+
+class InvalidAmountsError(ValueError):
+    """Valores de pagamento inválidos em um lote; `invalidos` lista (posição 0-based, valor recebido)."""
+
+    def __init__(self, invalidos):
+        self.invalidos = invalidos
+        amostra = ", ".join(f"transação {i + 1}: {v!r}" for i, v in invalidos[:10])
+        mais = f" e mais {len(invalidos) - 10}" if len(invalidos) > 10 else ""
+        super().__init__(f"{len(invalidos)} valor(es) de pagamento inválido(s): {amostra}{mais}")
+
+def parse_centavos(valor_str):
+    """Converte um valor digitado (ex.: "1234,56") em centavos inteiros; levanta InvalidAmountsError."""
+    return require_amounts([valor_str])[0]
+
+def require_amounts(valores):
+    """Converte um lote de valores digitados em centavos inteiros, numa única passada.
+
+    Levanta InvalidAmountsError com todos os valores inválidos do lote, não só o primeiro.
+    """
+    fullmatch = _VALOR_RE.fullmatch
+    centavos = []
+    invalidos = []
+    for i, valor in enumerate(valores):
+        m = fullmatch(valor) if isinstance(valor, str) else None
+        if m is None:
+            invalidos.append((i, valor))
+        else:
+            centavos.append(int("".join(m.groups("0"))))    # "12" + "5" + "0" -> 1250 centavos
+    if invalidos:
+        raise InvalidAmountsError(invalidos)
+    return centavos
+
+# ====================== DIAGNÓSTICO (TEMPOS E PERFIL) ======================
+_diagnostico = threading.local()    # Coletor ativo na thread (cada sessão do Streamlit roda na sua)
+
+class Diagnostics:
+    """Coleta tempo e quantidade de registros das etapas executadas dentro do `with`.
+
+    Sem coletor ativo, stage() não mede nada e custa só uma consulta ao thread-local. Com
+    `profile`, o bloco roda sob cProfile e tracemalloc: `perfil` guarda o relatório das `top`
+    funções mais custosas, `pico_memoria` o pico alocado e cada etapa a memória ao terminar.
+    Os campos de `contexto` (ex.: arquivo=...) são repetidos em cada linha exportada.
+    """
+
+    def __init__(self, operacao, profile=False, top=25, **contexto):
+        self.operacao = operacao
+        self.contexto = contexto
+        self.profile = profile
+        self.top = top
+        self.inicio = None
+        self.etapas = []
+        self.perfil = None
+        self.pico_memoria = None
+        self._nivel = 0
+        self._anterior = None
+        self._profiler = None
+        self._parar_tracemalloc = False
+
+    def __enter__(self):
+        self.inicio = datetime.datetime.now()
+        self._anterior = getattr(_diagnostico, "atual", None)
+        _diagnostico.atual = self
+        if self.profile:
+            import cProfile
+            import tracemalloc
+            self._parar_tracemalloc = not tracemalloc.is_tracing()
+            if self._parar_tracemalloc:
+                tracemalloc.start()
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self._profiler is not None:
+            import pstats
+            import tracemalloc
+            self._profiler.disable()
+            saida = io.StringIO()
+            pstats.Stats(self._profiler, stream=saida).sort_stats("cumulative").print_stats(self.top)
+            self.perfil = saida.getvalue()
+            self.pico_memoria = tracemalloc.get_traced_memory()[1]
+            if self._parar_tracemalloc:
+                tracemalloc.stop()
+            self._profiler = None
+        _diagnostico.atual = self._anterior
+        return False
+
+    @property
+    def segundos(self):
+        """Tempo total das etapas de primeiro nível."""
+        return sum(e["segundos"] for e in self.etapas if e["nivel"] == 0 and "segundos" in e)
+
+    def records(self):
+        """As etapas como dicts planos, com a operação e o horário de início (uma linha do JSON lines cada)."""
+        base = {"ts": self.inicio.isoformat(timespec="milliseconds") if self.inicio else None,
+                "operacao": self.operacao, **self.contexto}
+        if self.pico_memoria is not None:
+            base["pico_memoria_mb"] = round(self.pico_memoria / 2**20, 3)
+        return [dict(base, **etapa) for etapa in self.etapas]
+
+    def to_jsonl(self):
+        return "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in self.records())
+
+    def write_jsonl(self, destino):
+        """Acrescenta as métricas em JSON lines a `destino` (caminho ou arquivo de texto aberto)."""
+        if isinstance(destino, (str, os.PathLike)):
+            with open(destino, "a", encoding="utf-8") as f:
+                f.write(self.to_jsonl())
+        else:
+            destino.write(self.to_jsonl())
+
+class _Etapa:
+    __slots__ = ("diag", "registro", "_t0")
+
+    def __init__(self, diag, nome, registros):
+        self.diag = diag
+        self.registro = {"etapa": nome, "nivel": diag._nivel, "registros": registros}
+
+    def __enter__(self):
+        # Registrada na entrada, para as etapas ficarem na ordem em que começaram
+        self.diag.etapas.append(self.registro)
+        self.diag._nivel += 1
+        self._t0 = time.perf_counter()
+        return self.registro
+
+    def __exit__(self, tipo, valor, tb):
+        self.registro["segundos"] = round(time.perf_counter() - self._t0, 6)
+        self.diag._nivel -= 1
+        if tipo is not None:
+            self.registro["erro"] = tipo.__name__
+        if self.diag._profiler is not None:
+            import tracemalloc
+            self.registro["memoria_mb"] = round(tracemalloc.get_traced_memory()[0] / 2**20, 3)
+        return False
+
+class _SemMedicao:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+_SEM_MEDICAO = _SemMedicao()
+
+def stage(nome, registros=None):
+    """Mede uma etapa no coletor ativo (ver Diagnostics); sem coletor, não faz nada.
+
+    Uso: `with stage("retorno.parse") as etapa: ...; etapa["registros"] = n`.
+    """
+    diag = getattr(_diagnostico, "atual", None)
+    if diag is None:
+        return _SEM_MEDICAO
+    return _Etapa(diag, nome, registros)
+
+# ====================== LAYOUTS CNAB240 ======================
+# Cada campo é (início, fim, tipo, origem[, coluna]) com posições 1-based inclusivas, como no manual.
+# Tipos: "C" constante (origem é o texto já no tamanho do campo), "N" numérico (zeros à esquerda,
+# mantém os dígitos finais) e "A" alfanumérico (espaços à direita, trunca). A origem de "N"/"A" é
+# um parâmetro do formatador, uma chave do dict de dados ou (chave, valor padrão) para d.get.
+# Posições não declaradas são preenchidas com espaços. A coluna opcional nomeia o campo no retorno.
+LAYOUT_HEADER_ARQUIVO = [
+    (1, 3, "C", "077"),                                       # Código do banco
+    (4, 7, "C", "0000"),                                      # Lote de serviço
+    (8, 8, "C", "0"),                                         # Tipo de registro
+    (18, 18, "C", "2"),                                       # Tipo de documento (CNPJ)
+    (19, 32, "N", "cnpj"),                                    # CNPJ
+    (53, 57, "N", "agencia"),                                 # Agência
+    (58, 58, "A", "agencia_dv"),                              # Dígito da agência
+    (59, 70, "N", "conta"),                                   # Conta corrente
+    (71, 71, "N", "conta_dv"),                                # Dígito da conta
+    (73, 102, "A", "nome_empresa"),                           # Nome da empresa
+    (103, 132, "C", "BANCO INTER"),                           # Nome do banco
+    (143, 143, "C", "1"),                                     # Código de remessa
+    (144, 151, "A", "data"),                                  # Data de geração
+    (152, 157, "A", "hora"),                                  # Hora de geração
+    (158, 163, "N", "sequencial"),                            # Número sequencial do arquivo
+    (164, 166, "C", "107"),                                   # Versão do layout
+    (167, 171, "C", "01600"),                                 # Densidade de gravação
+]
+
+LAYOUT_HEADER_LOTE_PIX = [
+    (1, 3, "C", "077"),                                       # Código do banco
+    (4, 7, "C", "0001"),                                      # Lote de serviço
+    (8, 8, "C", "1"),                                         # Tipo de registro
+    (9, 9, "C", "C"),                                         # Tipo de operação
+    (10, 11, "C", "00"),                                      # Tipo de serviço
+    (12, 13, "C", "45"),                                      # Forma de lançamento PIX
+    (14, 16, "C", "046"),                                     # Versão do layout do lote
+    (18, 18, "C", "2"),                                       # Tipo de documento da empresa
+    (19, 32, "N", "cnpj"),                                    # CPF/CNPJ
+    (53, 57, "N", "agencia"),                                 # Agência
+    (58, 58, "A", "agencia_dv"),                              # DV Agência
+    (59, 70, "N", "conta"),                                   # Conta
+    (71, 71, "N", "conta_dv"),                                # DV Conta
+    (73, 102, "A", "nome_empresa"),                           # Nome da empresa
+    (103, 142, "A", ("generica", "")),                        # Informação genérica opcional
+    (143, 172, "A", "rua"),                                   # Nome da Rua
+    (173, 177, "N", "numero"),                                # Número do local
+    (178, 192, "A", "complemento"),                           # Complemento
+    (193, 212, "A", "cidade"),                                # Cidade
+    (213, 217, "N", "cep"),                                   # CEP
+    (221, 222, "A", "estado"),                                # Sigla do Estado
+]
+
+def _layout_segmento_a(bloco_favorecido):
+    return [
+        (1, 3, "C", "077", "Código Banco"),
+        (4, 7, "C", "0001", "Lote"),
+        (8, 8, "C", "3", "Tipo Registro"),
+        (9, 13, "N", "seq"),                                  # Número sequencial do registro
+        (14, 14, "C", "A", "Segmento"),
+        (15, 15, "C", "0", "Tipo Movimento"),
+        (16, 17, "C", "00", "Instrução Movimento"),
+        (18, 20, "C", "000", "Câmara Centralizadora"),
+        *bloco_favorecido,                                    # Dados do favorecido (21-73)
+        (74, 93, "A", ("doc_empresa", ""), "Doc Empresa"),
+        (94, 101, "A", "data_pagamento", "Data Pagamento"),
+        (102, 104, "C", "BRL", "Moeda"),
+        (105, 119, "C", "0" * 15, "Qtde Moeda"),
+        (120, 134, "N", "valor", "Valor Nominal (R$)"),       # Em centavos
+        (135, 154, "C", "", "Doc Banco"),                     # Preenchido pelo banco no retorno
+        (155, 162, "C", "", "Data Efetivação"),               # Preenchido pelo banco no retorno
+        (163, 177, "C", "", "Valor Efetivo (R$)"),            # Preenchido pelo banco no retorno
+        (200, 201, "C", "01", "Tipo de Conta"),
+        (220, 224, "C", "00010", "Código Finalidade"),
+        (231, 240, "C", "", "Ocorrência"),                    # Preenchido pelo banco no retorno
+    ]
+
+LAYOUT_SEGMENTO_A_PIX_CHAVE = _layout_segmento_a([
+    (21, 23, "C", "000"),                                     # Banco do favorecido
+    (24, 28, "C", "00000"),                                   # Agência do favorecido
+    (30, 41, "C", "0" * 12),                                  # Conta do favorecido
+])
+
+LAYOUT_SEGMENTO_A_PIX_BANCARIO = _layout_segmento_a([
+    (21, 23, "N", ("fav_banco", "")),                         # Banco do favorecido
+    (24, 28, "N", ("fav_agencia", "")),                       # Agência do favorecido
+    (29, 29, "A", ("fav_agencia_dv", "")),                    # DV da agência
+    (30, 41, "N", ("fav_conta", "")),                         # Conta do favorecido
+    (42, 42, "A", ("fav_conta_dv", "")),                      # DV da conta
+    (44, 73, "A", ("fav_nome", "")),                          # Nome do favorecido
+])
+
+LAYOUT_SEGMENTO_B_PIX = [
+    (1, 3, "C", "077"),                                       # Código do banco
+    (4, 7, "C", "0001"),                                      # Lote de serviço
+    (8, 8, "C", "3"),                                         # Tipo de registro
+    (9, 13, "N", "seq"),                                      # Número sequencial do registro
+    (14, 14, "C", "B"),                                       # Código de segmento
+    (15, 17, "A", "forma_iniciacao"),                         # Forma de iniciação (tipo de chave)
+    (18, 18, "N", "tipo_doc_fav"),                            # Tipo de documento do favorecido
+    (19, 32, "N", "doc_fav"),                                 # CPF/CNPJ do favorecido
+    (33, 67, "A", "txid"),                                    # TX ID
+    (128, 226, "A", "chave"),                                 # Chave PIX (tipos 01, 02 e 04)
+    (233, 240, "N", "ispb"),                                  # ISPB do favorecido
+]
+
+LAYOUT_TRAILER_LOTE = [
+    (1, 3, "C", "077"),                                       # Código do banco
+    (4, 7, "C", "0001"),                                      # Lote de serviço
+    (8, 8, "C", "5"),                                         # Tipo de registro
+    (18, 23, "N", "registros_lote"),                          # Quantidade de registros do lote
+    (24, 41, "N", "total_cents"),                             # Somatória dos valores
+    (42, 59, "C", "0" * 18),                                  # Somatória de quantidade de moedas
+]
+
+LAYOUT_TRAILER_ARQUIVO = [
+    (1, 3, "C", "077"),                                       # Código do banco
+    (4, 7, "C", "9999"),                                      # Lote de serviço
+    (8, 8, "C", "9"),                                         # Tipo de registro
+    (18, 23, "N", "total_lotes"),                             # Quantidade de lotes
+    (24, 29, "N", "total_registros"),                         # Quantidade de registros
+]
+
+def compile_layout(campos, params=()):
+    """Compila um layout em uma função formatador(d, *params) que devolve o registro de 240 posições.
+
+    Trechos constantes e brancos são pré-renderizados e agrupados; o formatador gerado é uma única
+    f-string com os campos variáveis, sem chamadas a pad_numeric/pad_alfa nem strings intermediárias.
+    """
+    partes = []
+    namespace = {}
+    constante = ""
+    pos = 1
+    for campo in sorted(campos, key=lambda c: c[0]):
+        inicio, fim, tipo, origem = campo[:4]
+        largura = fim - inicio + 1
+        if inicio < pos or fim > 240 or largura < 1:
+            raise ValueError(f"Campo inválido ou sobreposto no layout: {campo!r}")
+        constante += " " * (inicio - pos)
+        pos = fim + 1
+        if tipo == "C":
+            if len(origem) > largura:
+                raise ValueError(f"Constante maior que o campo: {campo!r}")
+            constante += origem.ljust(largura)
+            continue
+        if constante:
+            nome = f"_C{len(namespace)}"
+            namespace[nome] = constante
+            partes.append(f"{{{nome}}}")
+            constante = ""
+        if isinstance(origem, tuple):
+            expr = f"d.get({origem[0]!r}, {origem[1]!r})"
+        elif origem in params:
+            expr = origem
+        else:
+            expr = f"d[{origem!r}]"
+        if tipo == "N":
+            partes.append(f"{{str({expr}).zfill({largura})[-{largura}:]}}")
+        elif tipo == "A":
+            partes.append(f"{{{expr}!s:<{largura}.{largura}}}")
+        else:
+            raise ValueError(f"Tipo de campo desconhecido: {campo!r}")
+    constante += " " * (241 - pos)
+    if constante:
+        namespace["_CFIM"] = constante
+        partes.append("{_CFIM}")
+    assinatura = ", ".join(("d",) + tuple(params))
+    codigo = f"def formatar({assinatura}):\n    return f{''.join(partes)!r}\n"
+    exec(codigo, namespace)
+    return namespace["formatar"]
+
+def layout_columns(campos):
+    """Lista (coluna, início, fim) dos campos nomeados, com fatias 0-based para o parser de retorno."""
+    return [(c[4], c[0] - 1, c[1]) for c in sorted(campos, key=lambda c: c[0]) if len(c) > 4]
+
+# Layouts compilados uma única vez, na importação
+_FMT_HEADER_ARQUIVO = compile_layout(LAYOUT_HEADER_ARQUIVO, ("data", "hora"))
+_FMT_HEADER_LOTE_PIX = compile_layout(LAYOUT_HEADER_LOTE_PIX)
+_FMT_SEGMENTO_A_PIX_CHAVE = compile_layout(LAYOUT_SEGMENTO_A_PIX_CHAVE, ("seq", "data_pagamento", "valor"))
+_FMT_SEGMENTO_A_PIX_BANCARIO = compile_layout(LAYOUT_SEGMENTO_A_PIX_BANCARIO, ("seq", "data_pagamento", "valor"))
+_FMT_SEGMENTO_B_PIX = compile_layout(LAYOUT_SEGMENTO_B_PIX, ("seq", "chave", "ispb"))
+_FMT_TRAILER_LOTE = compile_layout(LAYOUT_TRAILER_LOTE, ("registros_lote", "total_cents"))
+_FMT_TRAILER_ARQUIVO = compile_layout(LAYOUT_TRAILER_ARQUIVO, ("total_lotes", "total_registros"))
+
+# ====================== FUNÇÕES PARA GERAR O ARQUIVO CNAB240 (REMESSA) ======================
+@functools.lru_cache(maxsize=4096)
+def _data_ddmmaaaa(data):
+    """strftime é caro e um lote costuma ter poucas datas de pagamento distintas."""
+    return data.strftime("%d%m%Y")
+
+def build_header_arquivo(company):
+    hoje = datetime.datetime.now()
+    return _FMT_HEADER_ARQUIVO(company, hoje.strftime("%d%m%Y"), hoje.strftime("%H%M%S"))
+
+def build_header_lote_pix(company):
+    return _FMT_HEADER_LOTE_PIX(company)
+
+def build_segmento_a_pix(transaction, seq, centavos=None):
+    if centavos is None:
+        centavos = parse_centavos(transaction["valor_pagamento"])
+    if transaction["forma_iniciacao"] == "05":
+        formatar = _FMT_SEGMENTO_A_PIX_BANCARIO
+    else:
+        formatar = _FMT_SEGMENTO_A_PIX_CHAVE
+    data = _data_ddmmaaaa(transaction["data_pagamento"])
+    return formatar(transaction, seq, data, centavos)
+
+def build_segmento_b_pix(transaction, seq):
+    if transaction["forma_iniciacao"] in ["01", "02", "04"]:
+        chave = transaction["chave_pix"]
+    else:
+        chave = ""
+    return _FMT_SEGMENTO_B_PIX(transaction, seq, chave, transaction["fav_ispb"] or "0")
+
+def build_trailer_lote(n_transacoes, total_centavos):
+    # Antes o total era em reais (float): recusa para não gravar "1234.56" no campo numérico
+    if not isinstance(total_centavos, numbers.Integral):
+        raise TypeError(f"total_centavos deve ser um inteiro em centavos, não {total_centavos!r}")
+    registros_lote = 2 * n_transacoes + 2
+    return _FMT_TRAILER_LOTE(None, registros_lote, total_centavos)
+
+def build_trailer_arquivo(total_lotes, total_registros):
+    return _FMT_TRAILER_ARQUIVO(None, total_lotes, total_registros)
+
+# Abaixo deste número de transações a geração fica serial. É uma estimativa, ainda não medida em
+# máquina com vários núcleos (rode benchmarks/bench_parallel.py para calibrar): o custo de iniciar
+# o pool e enviar as fatias aos processos deve superar o ganho em lotes pequenos.
+PARALLEL_MIN_TRANSACTIONS = 20000
+
+def _trailers(totais):
+    n = totais["transacoes"]
+    totais["registros"] = 1 + 1 + (2 * n) + 1 + 1
+    return build_trailer_lote(n, totais["total_centavos"]), build_trailer_arquivo(1, totais["registros"])
+
+# Chave em que cada transação guarda seus registros já renderizados: (seq, seg_a, seg_b, centavos)
+RECORD_CACHE_KEY = "_registros"
+
+def render_transaction(transaction, seq, centavos=None):
+    """Devolve (seg_a, seg_b, centavos) da transação na sequência `seq`, usando o cache guardado nela.
+
+    Na primeira chamada os registros são renderizados e guardados em transaction[RECORD_CACHE_KEY];
+    nas seguintes só o número sequencial (posições 9-13) é trocado, se tiver mudado. `centavos`, se
+    informado, é o valor já convertido (ver require_amounts).
+    """
+    cache = transaction.get(RECORD_CACHE_KEY)
+    if cache is None:
+        if centavos is None:
+            centavos = parse_centavos(transaction["valor_pagamento"])
+        cache = (seq, build_segmento_a_pix(transaction, seq, centavos), build_segmento_b_pix(transaction, seq + 1),
+                 centavos)
+        transaction[RECORD_CACHE_KEY] = cache
+    elif cache[0] != seq:
+        _, seg_a, seg_b, centavos = cache
+        seg_a = seg_a[:8] + pad_numeric(seq, 5) + seg_a[13:]
+        seg_b = seg_b[:8] + pad_numeric(seq + 1, 5) + seg_b[13:]
+        cache = (seq, seg_a, seg_b, centavos)
+        transaction[RECORD_CACHE_KEY] = cache
+    return cache[1], cache[2], cache[3]
+
+def update_transaction(transaction, **campos):
+    """Altera campos de uma transação e descarta os registros guardados para ela."""
+    transaction.update(campos)
+    transaction.pop(RECORD_CACHE_KEY, None)
+
+def _centavos_lote(transactions, cache_records=False):
+    """Converte os valores de todas as transações de uma vez; inválidos são reportados juntos.
+
+    Com `cache_records` as transações que já têm registros guardados ficam com None.
+    """
+    pendentes = [i for i, t in enumerate(transactions) if not (cache_records and RECORD_CACHE_KEY in t)]
+    centavos = [None] * len(transactions)
+    try:
+        with stage("remessa.valores", len(pendentes)):
+            convertidos = require_amounts([transactions[i]["valor_pagamento"] for i in pendentes])
+    except InvalidAmountsError as e:
+        raise InvalidAmountsError([(pendentes[i], valor) for i, valor in e.invalidos]) from None
+    for i, c in zip(pendentes, convertidos):
+        centavos[i] = c
+    return centavos
+
+def iter_cnab_records(company, transactions, totais=None, cache_records=False):
+    """Gera os registros do arquivo de remessa um a um, acumulando contagens e total em `totais`.
+
+    Os valores são convertidos em lote antes do primeiro registro; havendo inválidos, nada é gerado
+    e InvalidAmountsError lista todos eles. Com `cache_records` os Segmentos A/B vêm de
+    render_transaction e ficam guardados nas transações.
+    """
+    if totais is None:
+        totais = {}
+    totais.update(transacoes=0, registros=0, total_centavos=0)
+    lote_centavos = _centavos_lote(transactions, cache_records)
+    yield build_header_arquivo(company)
+    yield build_header_lote_pix(company)
+    seq = 1
+    for t, centavos in zip(transactions, lote_centavos):
+        if cache_records:
+            seg_a, seg_b, centavos = render_transaction(t, seq, centavos)
+        else:
+            seg_a = build_segmento_a_pix(t, seq, centavos)
+            seg_b = build_segmento_b_pix(t, seq + 1)
+        yield seg_a
+        yield seg_b
+        seq += 2
+        totais["transacoes"] += 1
+        totais["total_centavos"] += centavos
+    yield from _trailers(totais)
+
+def _render_detalhes(fatia):
+    """Renderiza os Segmentos A/B de uma fatia de transações (executado nos processos do pool)."""
+    transactions, centavos, seq = fatia
+    linhas = []
+    for t, c in zip(transactions, centavos):
+        linhas.append(build_segmento_a_pix(t, seq, c))
+        linhas.append(build_segmento_b_pix(t, seq + 1))
+        seq += 2
+    return "\n".join(linhas)
+
+def _iter_blocos_paralelo(company, transactions, totais, workers, chunk_transactions):
+    """Gera a remessa em blocos de texto, com os detalhes renderizados em paralelo e na ordem original."""
+    from concurrent.futures import ProcessPoolExecutor
+    totais.update(transacoes=0, registros=0, total_centavos=0)
+    # Os valores são convertidos e validados aqui, em lote; os processos recebem os centavos prontos
+    centavos = _centavos_lote(transactions)
+    yield build_header_arquivo(company) + "\n" + build_header_lote_pix(company)
+    # A sequência de cada transação é determinística (2*i+1 e 2*i+2), então as fatias são independentes
+    fatias = ((transactions[i:i + chunk_transactions], centavos[i:i + chunk_transactions], 2 * i + 1)
+              for i in range(0, len(transactions), chunk_transactions))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Janela de até 2*workers fatias em andamento (pool.map enviaria todas de uma vez e guardaria
+        # os blocos prontos): a memória fica limitada, como na geração serial
+        pendentes = deque()
+        for fatia in fatias:
+            if len(pendentes) >= 2 * workers:
+                yield pendentes.popleft().result()
+            pendentes.append(pool.submit(_render_detalhes, fatia))
+        while pendentes:
+            yield pendentes.popleft().result()
+    totais["transacoes"] = len(transactions)
+    totais["total_centavos"] = sum(centavos)
+    yield "\n".join(_trailers(totais))
+
+def _iter_blocos(company, transactions, totais, chunk_records, cache_records):
+    bloco = []
+    for record in iter_cnab_records(company, transactions, totais, cache_records):
+        bloco.append(record)
+        if len(bloco) >= chunk_records:
+            yield "\n".join(bloco)
+            bloco = []
+    if bloco:
+        yield "\n".join(bloco)
+
+def write_cnab_file(company, transactions, sink, encoding=None, chunk_records=2048, workers=1,
+                    chunk_transactions=10000, cache_records=False):
+    """Escreve a remessa em `sink` (arquivo ou buffer) em blocos de `chunk_records` registros.
+
+    Com `encoding` informado os blocos são gravados como bytes. Com `workers` > 1 e pelo menos
+    PARALLEL_MIN_TRANSACTIONS transações, os detalhes são renderizados em um ProcessPoolExecutor,
+    em fatias de `chunk_transactions`. Com `cache_records` os registros guardados nas transações
+    são reaproveitados (ver render_transaction) e a geração é sempre serial.
+    O conteúdo é idêntico ao de generate_cnab_file. Retorna o dict com as contagens e o total em
+    centavos (`total_centavos`). Valores inválidos levantam InvalidAmountsError antes de qualquer escrita.
+    """
+    totais = {}
+    if workers > 1 and not cache_records and len(transactions) >= PARALLEL_MIN_TRANSACTIONS:
+        blocos = _iter_blocos_paralelo(company, transactions, totais, workers, chunk_transactions)
+    else:
+        blocos = _iter_blocos(company, transactions, totais, chunk_records, cache_records)
+    separador = ""
+    with stage("remessa.gerar") as etapa:
+        for bloco in blocos:
+            dados = separador + bloco
+            sink.write(dados.encode(encoding) if encoding else dados)
+            separador = "\n"
+        etapa["registros"] = totais["registros"]
+    return totais
+
+def generate_cnab_file(company, transactions, workers=1):
+    buffer = io.StringIO()
+    write_cnab_file(company, transactions, buffer, workers=workers)
+    return buffer.getvalue()
+
+# ====================== FUNÇÃO PARA IMPORTAR E PARSER O ARQUIVO RETORNO (.RET) ======================
+# Campos do Segmento A no retorno, derivados do mesmo layout usado na remessa
+RET_SEGMENTO_A_CAMPOS = layout_columns(LAYOUT_SEGMENTO_A_PIX_CHAVE)
+RET_CAMPOS_VALOR = {"Valor Nominal (R$)", "Valor Efetivo (R$)"}
+# A conciliação também precisa do número sequencial (posições 9-13), fora das colunas do retorno
+RET_CAMPOS_CONCILIACAO = sorted(RET_SEGMENTO_A_CAMPOS + [("Nº Registro", 8, 13)], key=lambda campo: campo[1])
+
+# Fatias e conversão de cada campo, calculadas uma vez para o parser linha a linha
+_RET_FATIAS = [(nome, slice(inicio, fim), nome in RET_CAMPOS_VALOR) for nome, inicio, fim in RET_SEGMENTO_A_CAMPOS]
+
+def parse_ret_file(text):
+    registros = []
+    for line in text.splitlines():
+        # Processa apenas registros de detalhe (tipo "3") e, dentro destes, apenas os Segmento A
+        if line[7:8] != "3" or line[13:14] != "A":
+            continue
+        # Garante que a linha tenha 240 caracteres
+        if len(line) < 240:
+            line = line.ljust(240)
+        reg = {}
+        for nome, fatia, em_reais in _RET_FATIAS:
+            valor = line[fatia].strip()
+            if em_reais:
+                try:
+                    valor = int(valor) / 100.0
+                except ValueError:
+                    valor = 0.0
+            reg[nome] = valor
+        # Define Status com base na Data Efetivação (se diferente de "00000000")
+        efetivacao = reg["Data Efetivação"]
+        reg["Status"] = "Pago" if efetivacao and efetivacao != "00000000" else "Não Pago"
+        registros.append(reg)
+    return registros
+
+def _cents_to_reais(campo):
+    """Converte um array de campos numéricos (já sem espaços) em reais; inválidos viram 0."""
+    import numpy as np
+    validos = np.char.isdecimal(campo)
+    cents = np.zeros(len(campo), dtype=np.int64)
+    if validos.any():
+        cents[validos] = campo[validos].astype(np.int64)
+    # Casos raros (sinal, "_" etc.) seguem a mesma regra do int() do parser linha a linha
+    for i in np.flatnonzero(~validos & (campo != "")):
+        try:
+            cents[i] = int(campo[i])
+        except ValueError:
+            cents[i] = 0
+    return cents / 100.0
+
+def parse_ret_columns(text, campos=RET_SEGMENTO_A_CAMPOS):
+    """Versão vetorizada de parse_ret_file: devolve um dict coluna -> array, nas mesmas colunas.
+
+    `campos` (nome, início, fim) permite extrair outras colunas, como em RET_CAMPOS_CONCILIACAO.
+    """
+    import numpy as np
+    lines = [line for line in text.splitlines() if line.strip()]
+    try:
+        # Buffer de largura fixa (1 byte por caractere); linhas curtas ficam completadas com nulos
+        buf = np.array([line.encode("latin-1") for line in lines], dtype="S240")
+        codigos = buf.view(np.uint8)
+    except UnicodeEncodeError:
+        buf = np.array(lines, dtype="U240")
+        codigos = buf.view(np.uint32)
+    # Matriz (linhas x 240) com o código de cada caractere; em latin-1 o byte já é o code point
+    return _ret_columns_from_codes(codigos.reshape(len(lines), 240), campos)
+
+def _ret_columns_from_codes(codigos, campos=RET_SEGMENTO_A_CAMPOS):
+    import numpy as np
+    codigos = codigos[(codigos[:, 7] == ord("3")) & (codigos[:, 13] == ord("A"))]
+    colunas = {}
+    for nome, inicio, fim in campos:
+        campo = codigos[:, inicio:fim].astype(np.uint32).view(f"U{fim - inicio}").ravel()
+        campo = np.char.strip(campo)
+        colunas[nome] = _cents_to_reais(campo) if nome in RET_CAMPOS_VALOR else campo
+    efetivacao = colunas["Data Efetivação"]
+    pago = (efetivacao != "") & (efetivacao != "00000000")
+    colunas["Status"] = np.where(pago, "Pago", "Não Pago")
+    return colunas
+
+def decode_ret_bytes(file_bytes):
+    """Decodifica o conteúdo do arquivo de retorno: UTF-8 e, se falhar, latin1."""
+    try:
+        return file_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        return file_bytes.decode("latin1")
+
+# Separadores de linha de str.splitlines que bytes.splitlines não reconhece (\x85 só em latin1)
+_SEPARADORES_EXTRAS_ASCII = (b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e")
+_SEPARADORES_EXTRAS_LATIN1 = _SEPARADORES_EXTRAS_ASCII + (b"\x85",)
+
+def _iter_ret_chunks(f, batch_bytes):
+    """Lê blocos de ~batch_bytes de um arquivo binário, sempre terminando logo após uma quebra de linha."""
+    resto = b""
+    while True:
+        bloco = f.read(batch_bytes)
+        if not bloco:
+            break
+        bloco = resto + bloco if resto else bloco
+        corte = bloco.rfind(b"\n") + 1
+        if corte == 0:
+            # Arquivo só com CR: corta no último \r, exceto o final do bloco (pode ser o início de um \r\n)
+            corte = bloco.rfind(b"\r", 0, len(bloco) - 1) + 1
+        if corte == 0:                                   # Linha maior que o bloco: continua lendo
+            resto = bloco
+            continue
+        resto = bloco[corte:]
+        yield bloco[:corte]
+    if resto:
+        yield resto
+
+def _detect_ret_encoding(f, batch_bytes):
+    """Mesma regra de decode_ret_bytes (UTF-8, senão latin1), verificada bloco a bloco."""
+    for bloco in _iter_ret_chunks(f, batch_bytes):
+        if not bloco.isascii():
+            try:
+                bloco.decode("utf-8")                    # Os blocos terminam em b"\n", nunca no meio de um caractere
+            except UnicodeDecodeError:
+                return "latin1"
+    return "utf-8"
+
+def _parse_ret_chunk(bloco, encoding, campos):
+    import numpy as np
+    # Um "in" por separador (busca em C, tipo memchr) é bem mais rápido que uma classe de regex
+    if encoding == "latin1":
+        direto = not any(sep in bloco for sep in _SEPARADORES_EXTRAS_LATIN1)
+    else:
+        direto = bloco.isascii() and not any(sep in bloco for sep in _SEPARADORES_EXTRAS_ASCII)
+    if not direto:
+        return parse_ret_columns(bloco.decode(encoding), campos)
+    # Um byte por caractere: as linhas vão direto para o buffer S240, sem decodificar o bloco.
+    # Linhas em branco não precisam ser removidas, pois nunca passam no filtro de tipo "3"/segmento "A".
+    buf = np.array(bloco.splitlines(), dtype="S240")
+    return _ret_columns_from_codes(buf.view(np.uint8).reshape(len(buf), 240), campos)
+
+def iter_ret_batches(source, batch_bytes=16 * 1024 * 1024, encoding=None, campos=RET_SEGMENTO_A_CAMPOS):
+    """Analisa um arquivo .RET em lotes, com memória limitada pelo tamanho do bloco.
+
+    `source` pode ser um caminho (lido via mmap), bytes ou um arquivo binário. Cada lote é um
+    dict coluna -> array como o de parse_ret_columns (com as mesmas `campos`); concatenados,
+    equivalem a parse_ret_file.
+    Sem `encoding`, a regra UTF-8/latin1 é decidida numa primeira passada, o que exige um
+    arquivo posicionável (seek).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from iter_ret_batches(mm, batch_bytes, encoding, campos)
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if encoding is None:
+        with stage("retorno.codificacao"):
+            inicio = source.tell()
+            encoding = _detect_ret_encoding(source, batch_bytes)
+            source.seek(inicio)
+    for bloco in _iter_ret_chunks(source, batch_bytes):
+        colunas = _parse_ret_chunk(bloco, encoding, campos)
+        if len(colunas["Status"]):
+            yield colunas
+
+def parse_ret_stream(source, batch_bytes=16 * 1024 * 1024, encoding=None, campos=RET_SEGMENTO_A_CAMPOS):
+    """Junta os lotes de iter_ret_batches em um único dict coluna -> array."""
+    import numpy as np
+    with stage("retorno.parse") as etapa:
+        lotes = list(iter_ret_batches(source, batch_bytes, encoding, campos))
+        if not lotes:
+            colunas = parse_ret_columns("", campos)
+        else:
+            colunas = {nome: np.concatenate([lote[nome] for lote in lotes]) for nome in lotes[0]}
+        etapa["registros"] = len(colunas["Status"])
+    return colunas
+
+def ret_dataframe(file_bytes):
+    """Analisa um arquivo .RET (bytes, caminho ou arquivo binário), devolvendo o DataFrame dos Segmentos A."""
+    import pandas as pd
+    colunas = parse_ret_stream(file_bytes)
+    with stage("retorno.dataframe", len(colunas["Status"])):
+        return pd.DataFrame(colunas)
+
+class RetCache:
+    """LRU de arquivos de retorno já analisados, chaveado pelo SHA-256 do conteúdo.
+
+    `loader` transforma os bytes no objeto guardado (por padrão ret_dataframe). A ocupação é
+    medida pelo tamanho dos arquivos de origem; ao passar de `max_bytes` os itens menos usados
+    são descartados. Os objetos devolvidos são compartilhados e não devem ser alterados.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, loader=None):
+        self.max_bytes = max_bytes
+        self.loader = loader or ret_dataframe
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_parse(self, file_bytes):
+        """Devolve (resultado do loader, hit) para o conteúdo informado, analisando-o só se necessário."""
+        chave = hashlib.sha256(file_bytes).hexdigest()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return item[0], True
+        df = self.loader(file_bytes)
+        with self._lock:
+            self.misses += 1
+            if chave not in self._itens:
+                self._itens[chave] = (df, len(file_bytes))
+                self.total_bytes += len(file_bytes)
+            while self.total_bytes > self.max_bytes and len(self._itens) > 1:
+                _, (_, tamanho) = self._itens.popitem(last=False)
+                self.total_bytes -= tamanho
+        return df, False
+
+    def __len__(self):
+        return len(self._itens)
+
+class RetIndex:
+    """Índices sobre o DataFrame de um retorno para filtrar, paginar e resumir sem varrer linha a linha.
+
+    Status e Ocorrência viram categóricos (filtro pelos códigos); Data Efetivação e Doc Empresa
+    ganham uma ordenação (argsort) consultada com searchsorted para intervalos e prefixos.
+    """
+
+    def __init__(self, df):
+        import numpy as np
+        import pandas as pd
+        df = df.copy()
+        df["Status"] = df["Status"].astype("category")
+        df["Ocorrência"] = df["Ocorrência"].astype("category")
+        self.df = df
+        self.datas = pd.to_datetime(df["Data Efetivação"], format="%d%m%Y", errors="coerce").to_numpy()
+        self.datas_pagamento = pd.to_datetime(df["Data Pagamento"], format="%d%m%Y", errors="coerce")
+        # Só os efetivados entram na ordenação por data (NaT ficam no fim do argsort e são cortados)
+        self._ordem_data = np.argsort(self.datas, kind="stable")[:np.count_nonzero(~np.isnat(self.datas))]
+        self._datas_ordenadas = self.datas[self._ordem_data]
+        docs = df["Doc Empresa"].to_numpy(dtype=object)
+        self._ordem_doc = np.argsort(docs, kind="stable")
+        self._docs_ordenados = docs[self._ordem_doc]
+
+    def __len__(self):
+        return len(self.df)
+
+    def categories(self, coluna):
+        return list(self.df[coluna].cat.categories)
+
+    def _faixa(self, ordem, ordenados, inicio, fim):
+        """Máscara das linhas com inicio <= valor < fim (None deixa o limite aberto)."""
+        import numpy as np
+        lo = 0 if inicio is None else np.searchsorted(ordenados, inicio, "left")
+        hi = len(ordenados) if fim is None else np.searchsorted(ordenados, fim, "left")
+        mascara = np.zeros(len(self.df), dtype=bool)
+        mascara[ordem[lo:hi]] = True
+        return mascara
+
+    def filter(self, status=None, ocorrencias=None, data_inicio=None, data_fim=None, doc_empresa=None):
+        """Devolve as posições (em ordem de arquivo) que atendem a todos os filtros informados."""
+        import numpy as np
+        mascara = np.ones(len(self.df), dtype=bool)
+        for coluna, valores in (("Status", status), ("Ocorrência", ocorrencias)):
+            if valores:
+                categorias = self.df[coluna].cat.categories
+                codigos = self.df[coluna].cat.codes.to_numpy()
+                mascara &= np.isin(codigos, np.flatnonzero(categorias.isin(valores)))
+        if data_inicio is not None or data_fim is not None:
+            inicio = None if data_inicio is None else np.datetime64(data_inicio, "D").astype(self.datas.dtype)
+            fim = None if data_fim is None else (np.datetime64(data_fim, "D") + 1).astype(self.datas.dtype)
+            mascara &= self._faixa(self._ordem_data, self._datas_ordenadas, inicio, fim)
+        if doc_empresa:
+            # Busca por prefixo: tudo entre o prefixo e o prefixo seguido do maior caractere possível
+            mascara &= self._faixa(self._ordem_doc, self._docs_ordenados, doc_empresa, doc_empresa + "\U0010ffff")
+        return np.flatnonzero(mascara)
+
+    def page(self, posicoes, pagina, tamanho):
+        """Fatia `pagina` (a partir de 1) das posições filtradas, já como DataFrame."""
+        inicio = (pagina - 1) * tamanho
+        return self.df.iloc[posicoes[inicio:inicio + tamanho]]
+
+    def summary(self, posicoes):
+        """Quantidade e totais por Data Pagamento e Status das posições filtradas."""
+        df = self.df.iloc[posicoes]
+        data = self.datas_pagamento.iloc[posicoes].dt.date
+        resumo = df.groupby([data, df["Status"]], observed=True, dropna=False).agg(
+            Quantidade=("Status", "size"),
+            **{"Valor Nominal (R$)": ("Valor Nominal (R$)", "sum"),
+               "Valor Efetivo (R$)": ("Valor Efetivo (R$)", "sum")},
+        )
+        return resumo.reset_index()
+
+def ret_index(file_bytes):
+    """Decodifica, analisa e indexa um arquivo .RET (loader para RetCache)."""
+    df = ret_dataframe(file_bytes)
+    with stage("retorno.indice", len(df)):
+        return RetIndex(df)
+
+# ====================== CONCILIAÇÃO REMESSA x RETORNO ======================
+# Códigos de ocorrência (2 posições cada, até 5 por registro) que não indicam rejeição:
+# "00" crédito efetivado e "BD" inclusão efetuada com sucesso.
+OCORRENCIAS_ACEITAS = {"00", "BD"}
+
+def _ocorrencia_rejeitada(ocorrencias):
+    """Máscara dos registros com algum código de ocorrência fora de OCORRENCIAS_ACEITAS."""
+    import numpy as np
+    # Cada campo de 10 posições vira uma linha com seus 5 códigos de 2 posições
+    codigos = np.asarray(ocorrencias, dtype="U10").view("U2").reshape(-1, 5)
+    invalidos = (codigos != "") & ~np.isin(codigos, list(OCORRENCIAS_ACEITAS))
+    return invalidos.any(axis=1)
+
+def _centavos(valores):
+    import numpy as np
+    return np.rint(np.asarray(valores, dtype=float) * 100).astype(np.int64)
+
+def _localizar(indice, linhas, chaves):
+    """Linha da remessa de cada chave (busca hash em um índice sem repetições); -1 se ausente."""
+    import numpy as np
+    if len(indice) == 0:                                  # linhas[pos] falharia com pos = -1
+        return np.full(len(chaves), -1, dtype=np.intp)
+    pos = indice.get_indexer(chaves)
+    return np.where(pos >= 0, linhas[pos], -1)
+
+def reconcile(remessa, retorno, batch_bytes=16 * 1024 * 1024):
+    """Concilia os pagamentos de uma remessa com os registros de um arquivo de retorno.
+
+    `remessa` e `retorno` são o que iter_ret_batches aceita (caminho, bytes ou arquivo binário);
+    os Segmentos A da remessa têm o mesmo layout do retorno. Cada pagamento enviado é localizado
+    pelo Doc Empresa (quando preenchido e único na remessa) ou pelo Nº Registro, via tabelas hash
+    (pd.Index.get_indexer), com o retorno lido em lotes. Se o mesmo pagamento aparece mais de uma
+    vez no retorno, vale o último registro.
+
+    Devolve (conciliacao, sem_remessa): um DataFrame por pagamento enviado com a coluna
+    "Situação" e outro com os registros do retorno que não correspondem a nenhum envio.
+    """
+    import numpy as np
+    import pandas as pd
+    enviados = pd.DataFrame(parse_ret_stream(remessa, batch_bytes, campos=RET_CAMPOS_CONCILIACAO))
+    n = len(enviados)
+    docs = enviados["Doc Empresa"]
+    com_doc = ((docs != "") & ~docs.duplicated(keep=False)).to_numpy()
+    indice_doc, linhas_doc = pd.Index(docs[com_doc]), np.flatnonzero(com_doc)
+    # Doc Empresa vazio ou repetido na remessa não identifica o pagamento: usa o Nº Registro
+    docs_ambiguos = pd.Index(docs[~com_doc].unique())
+    seq_unico = (~enviados["Nº Registro"].duplicated()).to_numpy()
+    indice_seq, linhas_seq = pd.Index(enviados["Nº Registro"][seq_unico]), np.flatnonzero(seq_unico)
+
+    colunas_retorno = ["Valor Nominal (R$)", "Valor Efetivo (R$)", "Data Efetivação", "Ocorrência", "Status"]
+    casado = {c: np.full(n, np.nan) if c.startswith("Valor") else np.full(n, "", dtype=object)
+              for c in colunas_retorno}
+    encontrado = np.zeros(n, dtype=bool)
+    sem_remessa = []
+    for lote in iter_ret_batches(retorno, batch_bytes, campos=RET_CAMPOS_CONCILIACAO):
+        pos = _localizar(indice_doc, linhas_doc, lote["Doc Empresa"])
+        por_seq = pd.Index(lote["Doc Empresa"]).isin(docs_ambiguos)
+        pos[por_seq] = _localizar(indice_seq, linhas_seq, lote["Nº Registro"][por_seq])
+        achados = np.flatnonzero(pos >= 0)
+        # Último registro de cada pagamento no lote (os lotes seguintes sobrescrevem os anteriores)
+        _, ultimos = np.unique(pos[achados][::-1], return_index=True)
+        achados = achados[::-1][ultimos]
+        for c in colunas_retorno:
+            casado[c][pos[achados]] = lote[c][achados]
+        encontrado[pos[achados]] = True
+        if (pos < 0).any():
+            sem_remessa.append(pd.DataFrame({c: v[pos < 0] for c, v in lote.items()}))
+
+    conciliacao = enviados[["Nº Registro", "Doc Empresa", "Data Pagamento"]].copy()
+    conciliacao["Valor Enviado (R$)"] = enviados["Valor Nominal (R$)"]
+    for c in colunas_retorno:
+        conciliacao[c if c != "Status" else "Status Retorno"] = casado[c]
+    rejeitado = encontrado & _ocorrencia_rejeitada(casado["Ocorrência"])
+    enviado_cents = _centavos(enviados["Valor Nominal (R$)"])
+    pago = casado["Status"] == "Pago"
+    divergente = encontrado & (
+        (_centavos(np.nan_to_num(casado["Valor Nominal (R$)"])) != enviado_cents)
+        | (pago & (_centavos(np.nan_to_num(casado["Valor Efetivo (R$)"])) != enviado_cents))
+    )
+    conciliacao["Situação"] = np.select(
+        [~encontrado, rejeitado, divergente, pago],
+        ["Ausente no retorno", "Rejeitado", "Valor divergente", "Pago"],
+        default="Não pago",
+    )
+    if sem_remessa:
+        sem_remessa = pd.concat(sem_remessa, ignore_index=True)
+    else:
+        sem_remessa = pd.DataFrame(columns=list(parse_ret_columns("", RET_CAMPOS_CONCILIACAO)))
+    return conciliacao, sem_remessa
+
+# ====================== IMPORTAÇÃO DE TRANSAÇÕES EM LOTE (CSV/XLSX) ======================
+TRANSACTION_COLUMNS = [
+    "data_pagamento", "valor_pagamento", "doc_empresa", "forma_iniciacao", "fav_banco",
+    "fav_agencia", "fav_agencia_dv", "fav_conta", "fav_conta_dv", "fav_nome", "tipo_doc_fav",
+    "doc_fav", "txid", "chave_pix", "fav_ispb",
+]
+TRANSACTION_REQUIRED_COLUMNS = ["data_pagamento", "valor_pagamento", "forma_iniciacao", "tipo_doc_fav", "doc_fav"]
+
+def read_transactions_table(file, filename):
+    """Lê uma planilha CSV (separador "," ou ";") ou XLSX com uma transação por linha.
+
+    Todas as colunas são lidas como texto para preservar zeros à esquerda; colunas opcionais
+    ausentes viram "". Levanta ValueError se faltar alguma coluna obrigatória.
+    """
+    import pandas as pd
+    if filename.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(file, dtype=str, keep_default_na=False)
+    else:
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as f:
+                dados = f.read()
+        else:
+            dados = file.read()
+        try:
+            texto = dados.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            texto = dados.decode("latin1")
+        cabecalho = texto.split("\n", 1)[0]
+        sep = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+        df = pd.read_csv(io.StringIO(texto), sep=sep, dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    faltando = [c for c in TRANSACTION_REQUIRED_COLUMNS if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+    df = df.reindex(columns=TRANSACTION_COLUMNS, fill_value="")
+    for col in TRANSACTION_COLUMNS:
+        df[col] = df[col].astype(str).str.strip()
+    # Aceita tanto "03" quanto "3" ou "03 - CPF/CNPJ", como nas opções do formulário
+    df["forma_iniciacao"] = df["forma_iniciacao"].str.split(" - ").str[0].str.zfill(2)
+    df["tipo_doc_fav"] = df["tipo_doc_fav"].str.split(" - ").str[0]
+    # Datas no formato brasileiro (31/12/2025) ou ISO (2025-12-31, como o Excel exporta)
+    datas = pd.to_datetime(df["data_pagamento"], format="%d/%m/%Y", errors="coerce")
+    iso = datas.isna()
+    datas[iso] = pd.to_datetime(df.loc[iso, "data_pagamento"], format="ISO8601", errors="coerce")
+    df["data_pagamento"] = datas.dt.date
+    return df
+
+def validate_transactions(df):
+    """Valida o lote inteiro de forma vetorizada; devolve um DataFrame (Linha, Campo, Erro) vazio se ok."""
+    import pandas as pd
+    forma = df["forma_iniciacao"]
+    doc_len = df["doc_fav"].str.len()
+    usa_chave = forma.isin(["01", "02", "04"])
+    bancario = forma == "05"
+    regras = [
+        ("data_pagamento", df["data_pagamento"].isna(), "Data inválida"),
+        ("valor_pagamento", ~df["valor_pagamento"].str.fullmatch(VALOR_PATTERN), "Valor inválido (use 1234,56)"),
+        ("valor_pagamento", df["valor_pagamento"].str.fullmatch(r"\s*0{1,13}(?:[.,]00?)?\s*"), "Valor zerado"),
+        ("forma_iniciacao", ~forma.isin(["01", "02", "03", "04", "05"]), "Forma de iniciação deve ser 01 a 05"),
+        ("tipo_doc_fav", ~df["tipo_doc_fav"].isin(["1", "2"]), "Tipo de documento deve ser 1 (CPF) ou 2 (CNPJ)"),
+        ("doc_fav", ~df["doc_fav"].str.fullmatch(r"\d+"), "CPF/CNPJ deve conter somente números"),
+        ("doc_fav", (df["tipo_doc_fav"] == "1") & (doc_len != 11), "CPF deve ter 11 dígitos"),
+        ("doc_fav", (df["tipo_doc_fav"] == "2") & (doc_len != 14), "CNPJ deve ter 14 dígitos"),
+        ("chave_pix", usa_chave & (df["chave_pix"] == ""), "Chave PIX obrigatória para os tipos 01, 02 e 04"),
+        ("fav_ispb", (df["fav_ispb"] != "") & ~df["fav_ispb"].str.fullmatch(r"\d{8}"), "ISPB deve ter 8 dígitos"),
+    ]
+    for col, tamanho in [("fav_banco", 3), ("fav_agencia", 5), ("fav_conta", 12)]:
+        invalido = ~df[col].str.fullmatch(rf"\d{{1,{tamanho}}}")
+        regras.append((col, bancario & invalido, f"Obrigatório para o tipo 05 (até {tamanho} dígitos)"))
+    erros = [
+        pd.DataFrame({"Linha": df.index[mascara.to_numpy(dtype=bool)] + 2, "Campo": col, "Erro": msg})
+        for col, mascara, msg in regras if mascara.any()
+    ]
+    if not erros:
+        return pd.DataFrame(columns=["Linha", "Campo", "Erro"])
+    return pd.concat(erros, ignore_index=True).sort_values("Linha", kind="stable", ignore_index=True)
+
+def transactions_from_table(df):
+    """Converte o DataFrame validado na lista de dicts aceita por generate_cnab_file/write_cnab_file."""
+    return df[TRANSACTION_COLUMNS].to_dict("records")
+
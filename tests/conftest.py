@@ -0,0 +1,56 @@
+import datetime
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cnab240  # noqa: E402
+
+AGORA = datetime.datetime(2025, 3, 4, 5, 6, 7)
+
+COMPANY = {
+    "cnpj": "12345678000199", "agencia": "00001", "agencia_dv": "9", "conta": "123456", "conta_dv": "7",
+    "nome_empresa": "EMPRESA TESTE LTDA", "rua": "RUA A", "numero": "10", "complemento": "SALA 1",
+    "cidade": "SÃO PAULO", "cep": "01234", "estado": "SP", "generica": "", "sequencial": "0001",
+}
+
+VALORES = ["1234,56", "7", "12.5", "0,1", "99999,99", "1,00", "250,3", "0,01"]
+
+def make_transactions(n):
+    """Transações determinísticas cobrindo as cinco formas de iniciação e campos opcionais."""
+    transactions = []
+    for i in range(n):
+        forma = f"0{i % 5 + 1}"
+        bancario = forma == "05"
+        transactions.append({
+            "data_pagamento": datetime.date(2025, 1, 1) + datetime.timedelta(days=i % 40),
+            "valor_pagamento": VALORES[i % len(VALORES)],
+            "doc_empresa": ["", f"DOC{i}", "JOSÉ DA SILVA"][i % 3],
+            "forma_iniciacao": forma,
+            "fav_banco": "001" if bancario else "",
+            "fav_agencia": "1234" if bancario else "",
+            "fav_agencia_dv": "1" if bancario else "",
+            "fav_conta": str(98765 + i) if bancario else "",
+            "fav_conta_dv": "2" if bancario else "",
+            "fav_nome": "FULANO DE TAL" if bancario else "",
+            "tipo_doc_fav": "1" if i % 2 else "2",
+            "doc_fav": str(10**10 + 7919 * i),
+            "txid": f"TX{i}" if i % 4 else "",
+            "chave_pix": ["fulano@x.com", "+5511999999999", "abc-123"][i % 3],
+            "fav_ispb": "12345678" if i % 6 == 0 else "",
+        })
+    return transactions
+
+@pytest.fixture
+def relogio_fixo(monkeypatch):
+    """Congela datetime.now() do módulo, que entra no header do arquivo."""
+    class _DateTime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return AGORA
+
+    monkeypatch.setattr(cnab240, "datetime", types.SimpleNamespace(datetime=_DateTime, date=datetime.date))
+    return AGORA
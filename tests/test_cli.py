@@ -0,0 +1,120 @@
+"""Modo em lote (cli.py): expansão de diretórios, falhas por arquivo, métricas e formatos de saída."""
+import json
+
+import pandas as pd
+import pytest
+
+import cli
+import cnab240
+from conftest import COMPANY, make_transactions
+
+CABECALHO = "data_pagamento;valor_pagamento;forma_iniciacao;tipo_doc_fav;doc_fav;chave_pix;doc_empresa\n"
+
+def _planilha(caminho, n):
+    linhas = [f"{d:02d}/03/2025;{d},50;03;1;{d:011d};;DOC{d}\n" for d in range(1, n + 1)]
+    caminho.write_text(CABECALHO + "".join(linhas), encoding="utf-8")
+    return caminho
+
+@pytest.fixture
+def empresa(tmp_path):
+    caminho = tmp_path / "empresa.json"
+    caminho.write_text(json.dumps(COMPANY), encoding="utf-8")
+    return str(caminho)
+
+@pytest.fixture
+def retornos(tmp_path):
+    """Diretório com dois .RET (a própria remessa serve: o parser só lê os Segmentos A)."""
+    pasta = tmp_path / "retornos"
+    pasta.mkdir()
+    for nome, n in [("a.RET", 7), ("b.ret", 3)]:
+        (pasta / nome).write_bytes(cnab240.generate_cnab_file(COMPANY, make_transactions(n)).encode("utf-8"))
+    (pasta / "leiame.txt").write_text("ignorado")
+    (pasta / "sub.ret").mkdir()                 # Diretório com a extensão: também ignorado
+    return pasta
+
+def test_listar_arquivos(retornos, tmp_path):
+    avulso = str(tmp_path / "avulso.dat")
+    assert cli.listar_arquivos([str(retornos), avulso], cli.EXTENSOES["retorno"]) == [
+        str(retornos / "a.RET"), str(retornos / "b.ret"), avulso,
+    ]
+
+def test_remessa_diretorio(tmp_path, empresa, relogio_fixo, capsys):
+    planilhas = tmp_path / "planilhas"
+    planilhas.mkdir()
+    _planilha(planilhas / "a.csv", 4)
+    _planilha(planilhas / "b.csv", 2)
+    saida = tmp_path / "saida"
+    assert cli.main(["remessa", "--empresa", empresa, str(planilhas), "-o", str(saida), "-w", "1"]) == 0
+    assert sorted(p.name for p in saida.iterdir()) == ["a.rem", "b.rem"]
+    esperado = cnab240.transactions_from_table(cnab240.read_transactions_table(planilhas / "a.csv", "a.csv"))
+    assert (saida / "a.rem").read_text("utf-8") == cnab240.generate_cnab_file(COMPANY, esperado)
+    assert "(4 transações, 12 registros)" in capsys.readouterr().out
+
+def test_remessa_saida_ao_lado_da_entrada(tmp_path, empresa):
+    planilha = _planilha(tmp_path / "lote.csv", 1)
+    assert cli.main(["remessa", "--empresa", empresa, str(planilha), "-w", "1"]) == 0
+    assert (tmp_path / "lote.rem").exists()
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_falha_de_um_arquivo_nao_interrompe_os_demais(tmp_path, empresa, workers, capsys):
+    boa = _planilha(tmp_path / "boa.csv", 2)
+    invalida = tmp_path / "invalida.csv"
+    invalida.write_text(CABECALHO + "31/02/2025;0;9;1;123;;\n", encoding="utf-8")
+    sem_coluna = tmp_path / "sem_coluna.csv"
+    sem_coluna.write_text("data_pagamento;valor_pagamento\n01/03/2025;1\n", encoding="utf-8")
+    inexistente = tmp_path / "inexistente.csv"
+    saida = tmp_path / "saida"
+    entradas = [str(invalida), str(boa), str(sem_coluna), str(inexistente)]
+    assert cli.main(["remessa", "--empresa", empresa, *entradas, "-o", str(saida), "-w", workers]) == 1
+    assert [p.name for p in saida.iterdir()] == ["boa.rem"]
+    saidas = capsys.readouterr()
+    assert "boa.csv ->" in saidas.out
+    erros = saidas.err.splitlines()
+    assert len(erros) == 3
+    assert "4 problema(s) na planilha (linha 2 data_pagamento: Data inválida;" in erros[0]
+    assert "Colunas obrigatórias ausentes" in erros[1]
+    assert erros[2].startswith(f"{inexistente}: erro:")
+
+def test_empresa_incompleta(tmp_path, capsys):
+    empresa = tmp_path / "empresa.json"
+    empresa.write_text(json.dumps({"cnpj": "1"}), encoding="utf-8")
+    with pytest.raises(SystemExit) as saida:
+        cli.main(["remessa", "--empresa", str(empresa), str(tmp_path)])
+    assert saida.value.code == 2
+    assert "campos ausentes" in capsys.readouterr().err
+
+def test_retorno_csv(retornos, tmp_path):
+    saida = tmp_path / "saida"
+    assert cli.main(["retorno", str(retornos), "-o", str(saida), "-w", "1"]) == 0
+    assert sorted(p.name for p in saida.iterdir()) == ["a.csv", "b.csv"]
+    df = pd.read_csv(saida / "a.csv", sep=";", dtype=str, keep_default_na=False)
+    esperado = cnab240.ret_dataframe(str(retornos / "a.RET"))
+    assert list(df.columns) == list(esperado.columns)
+    assert len(df) == 7
+    assert df["Status"].tolist() == esperado["Status"].astype(str).tolist()
+
+def test_retorno_parquet(retornos, tmp_path):
+    pytest.importorskip("pyarrow")
+    saida = tmp_path / "saida"
+    assert cli.main(["retorno", str(retornos / "b.ret"), "-o", str(saida), "--formato", "parquet"]) == 0
+    df = pd.read_parquet(saida / "b.parquet")
+    pd.testing.assert_frame_equal(df, cnab240.ret_dataframe(str(retornos / "b.ret")), check_dtype=False,
+                                  check_categorical=False)
+
+def test_metricas(retornos, tmp_path):
+    metricas = tmp_path / "metricas.jsonl"
+    metricas.write_text('{"anterior": true}\n', encoding="utf-8")
+    argv = ["retorno", str(retornos), str(tmp_path / "falta.ret"), "-o", str(tmp_path), "-w", "1",
+            "--metricas", str(metricas)]
+    assert cli.main(argv) == 1
+    linhas = [json.loads(linha) for linha in metricas.read_text("utf-8").splitlines()]
+    assert linhas[0] == {"anterior": True}
+    por_arquivo = {}
+    for linha in linhas[1:]:
+        assert linha["operacao"] == "converter_retorno"
+        por_arquivo.setdefault(linha["arquivo"], []).append(linha)
+    a = por_arquivo[str(retornos / "a.RET")]
+    assert {e["etapa"] for e in a} >= {"retorno.parse", "retorno.gravar"}
+    assert next(e for e in a if e["etapa"] == "retorno.gravar")["registros"] == 7
+    # O arquivo que falhou também deixa a etapa, com o erro
+    assert any(e.get("erro") for e in por_arquivo[str(tmp_path / "falta.ret")])
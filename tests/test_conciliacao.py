@@ -0,0 +1,72 @@
+"""Conciliação remessa x retorno, inclusive quando o Doc Empresa não identifica os pagamentos."""
+import pytest
+
+import cnab240
+from conftest import COMPANY, make_transactions
+
+def _retorno(remessa, situacoes):
+    """Retorno da remessa com uma situação por Segmento A.
+
+    "pago", "aberto", "rejeitado" ou "ausente"; "efetivo_menor" paga um centavo a menos e
+    "nominal_maior" devolve o Valor Nominal um centavo acima do enviado.
+    """
+    linhas = []
+    detalhes = iter(situacoes)
+    for linha in remessa.split("\n"):
+        if linha[7] == "3" and linha[13] == "A":
+            situacao = next(detalhes)
+            if situacao == "ausente":
+                continue
+            if situacao == "nominal_maior":
+                linha = linha[:119] + f"{int(linha[119:134]) + 1:015d}" + linha[134:]
+            if situacao in ("pago", "nominal_maior"):
+                efetivacao, efetivo, ocorrencia = linha[93:101], linha[119:134], "00"
+            elif situacao == "efetivo_menor":
+                efetivacao, efetivo, ocorrencia = linha[93:101], f"{int(linha[119:134]) - 1:015d}", "00"
+            else:
+                efetivacao, efetivo = "00000000", "0" * 15
+                ocorrencia = "AB" if situacao == "rejeitado" else "BD"
+            linha = linha[:154] + efetivacao + efetivo + linha[177:230] + ocorrencia.ljust(10)
+        linhas.append(linha)
+    return "\r\n".join(linhas).encode("utf-8")
+
+SITUACOES = ["pago", "aberto", "rejeitado", "ausente", "pago", "pago"]
+ESPERADO = ["Pago", "Não pago", "Rejeitado", "Ausente no retorno", "Pago", "Pago"]
+
+@pytest.mark.parametrize("doc_empresa", [
+    lambda i: "",                    # Todos em branco (campo opcional no app)
+    lambda i: "MESMO DOC",           # Todos repetidos
+    lambda i: f"DOC{i}",             # Todos únicos
+    lambda i: ["", "X", "X", f"DOC{i}", "", f"DOC{i}"][i],
+])
+def test_reconcile_doc_empresa(doc_empresa):
+    transactions = make_transactions(len(SITUACOES))
+    for i, t in enumerate(transactions):
+        t["doc_empresa"] = doc_empresa(i)
+    remessa = cnab240.generate_cnab_file(COMPANY, transactions)
+    conciliacao, sem_remessa = cnab240.reconcile(remessa.encode("utf-8"), _retorno(remessa, SITUACOES))
+    assert conciliacao["Situação"].tolist() == ESPERADO
+    assert len(sem_remessa) == 0
+
+def test_reconcile_sem_correspondencia():
+    transactions = make_transactions(4)
+    for i, t in enumerate(transactions):
+        t["doc_empresa"] = f"DOC{i}"
+    remessa = cnab240.generate_cnab_file(COMPANY, transactions)
+    for i, t in enumerate(transactions[:2]):
+        t["doc_empresa"] = f"OUTRO{i}"
+    outra = cnab240.generate_cnab_file(COMPANY, transactions[:2])
+    conciliacao, sem_remessa = cnab240.reconcile(remessa.encode("utf-8"), _retorno(outra, ["pago", "pago"]))
+    assert (conciliacao["Situação"] == "Ausente no retorno").all()
+    assert sem_remessa["Doc Empresa"].tolist() == ["OUTRO0", "OUTRO1"]
+
+def test_reconcile_valor_divergente():
+    situacoes = ["pago", "efetivo_menor", "nominal_maior", "aberto"]
+    transactions = make_transactions(len(situacoes))
+    for i, t in enumerate(transactions):
+        t["doc_empresa"] = f"DOC{i}"
+    remessa = cnab240.generate_cnab_file(COMPANY, transactions)
+    conciliacao, _ = cnab240.reconcile(remessa.encode("utf-8"), _retorno(remessa, situacoes))
+    assert conciliacao["Situação"].tolist() == ["Pago", "Valor divergente", "Valor divergente", "Não pago"]
+    assert conciliacao["Valor Efetivo (R$)"][1] == pytest.approx(conciliacao["Valor Enviado (R$)"][1] - 0.01)
+    assert conciliacao["Valor Nominal (R$)"][2] == pytest.approx(conciliacao["Valor Enviado (R$)"][2] + 0.01)
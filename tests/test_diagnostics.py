@@ -0,0 +1,119 @@
+"""Coletor de diagnóstico: etapas aninhadas, tempo total, erros e exportação em JSON lines."""
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import cnab240
+
+def test_ordem_e_aninhamento():
+    with cnab240.Diagnostics("op") as diag:
+        with cnab240.stage("a", 3):
+            with cnab240.stage("a.1"):
+                with cnab240.stage("a.1.x"):
+                    pass
+            with cnab240.stage("a.2") as etapa:
+                etapa["registros"] = 7
+        with cnab240.stage("b"):
+            pass
+    assert [(e["etapa"], e["nivel"], e["registros"]) for e in diag.etapas] == [
+        ("a", 0, 3), ("a.1", 1, None), ("a.1.x", 2, None), ("a.2", 1, 7), ("b", 0, None),
+    ]
+    assert all(e["segundos"] >= 0 for e in diag.etapas)
+    assert "erro" not in diag.etapas[0]
+
+def test_segundos_soma_so_primeiro_nivel():
+    with cnab240.Diagnostics("op") as diag:
+        with cnab240.stage("a"):
+            with cnab240.stage("a.1"):
+                time.sleep(0.01)
+        with cnab240.stage("b"):
+            time.sleep(0.01)
+    a, a1, b = diag.etapas
+    assert diag.segundos == pytest.approx(a["segundos"] + b["segundos"])
+    assert diag.segundos < a["segundos"] + a1["segundos"] + b["segundos"]
+
+def test_segundos_ignora_etapa_em_andamento():
+    with cnab240.Diagnostics("op") as diag:
+        with cnab240.stage("a"):
+            pass
+        with cnab240.stage("b"):
+            assert diag.segundos == diag.etapas[0]["segundos"]
+
+def test_erro_registrado_e_propagado():
+    with pytest.raises(KeyError):
+        with cnab240.Diagnostics("op") as diag:
+            with cnab240.stage("a"):
+                with cnab240.stage("a.1"):
+                    raise KeyError("x")
+    assert [(e["etapa"], e["erro"]) for e in diag.etapas] == [("a", "KeyError"), ("a.1", "KeyError")]
+    assert all("segundos" in e for e in diag.etapas)
+    # O coletor é desativado mesmo com a exceção
+    assert cnab240.stage("depois") is cnab240._SEM_MEDICAO
+
+def test_sem_coletor_nao_mede():
+    with cnab240.stage("solta", 5) as etapa:
+        etapa["registros"] = 9
+    assert etapa == {"registros": 9}
+    with cnab240.stage("outra") as outra:
+        assert outra == {}
+    with cnab240.Diagnostics("op") as diag:
+        pass
+    assert diag.etapas == [] and diag.segundos == 0 and diag.to_jsonl() == ""
+
+def test_coletor_por_thread():
+    with cnab240.Diagnostics("op") as diag:
+        outra = threading.Thread(target=lambda: cnab240.stage("outra").__enter__())
+        outra.start()
+        outra.join()
+        with cnab240.stage("aqui"):
+            pass
+    assert [e["etapa"] for e in diag.etapas] == ["aqui"]
+
+def test_coletores_aninhados():
+    with cnab240.Diagnostics("externo") as externo:
+        with cnab240.Diagnostics("interno") as interno:
+            with cnab240.stage("x"):
+                pass
+        with cnab240.stage("y"):
+            pass
+    assert [e["etapa"] for e in interno.etapas] == ["x"]
+    assert [e["etapa"] for e in externo.etapas] == ["y"]
+
+def test_jsonl():
+    with cnab240.Diagnostics("retorno", arquivo="ação.ret") as diag:
+        with cnab240.stage("a", 2):
+            with cnab240.stage("a.1"):
+                pass
+    linhas = [json.loads(linha) for linha in diag.to_jsonl().splitlines()]
+    assert linhas == diag.records()
+    assert [(r["operacao"], r["arquivo"], r["etapa"], r["nivel"], r["registros"]) for r in linhas] == [
+        ("retorno", "ação.ret", "a", 0, 2), ("retorno", "ação.ret", "a.1", 1, None),
+    ]
+    assert linhas[0]["ts"] == linhas[1]["ts"] == diag.inicio.isoformat(timespec="milliseconds")
+    assert "pico_memoria_mb" not in linhas[0]
+    assert "ação.ret" in diag.to_jsonl()
+
+def test_write_jsonl_acrescenta(tmp_path):
+    destino = tmp_path / "metricas.jsonl"
+    for operacao in ("um", "dois"):
+        with cnab240.Diagnostics(operacao) as diag:
+            with cnab240.stage("x"):
+                pass
+        diag.write_jsonl(destino)
+    assert [json.loads(linha)["operacao"] for linha in destino.read_text("utf-8").splitlines()] == ["um", "dois"]
+    aberto = io.StringIO()
+    diag.write_jsonl(aberto)
+    assert aberto.getvalue() == diag.to_jsonl()
+
+def test_perfil():
+    with cnab240.Diagnostics("op", profile=True, top=5) as diag:
+        with cnab240.stage("aloca"):
+            dados = [bytes(1000) for _ in range(1000)]
+    del dados
+    assert "function calls" in diag.perfil
+    assert diag.pico_memoria >= 1000 * 1000
+    assert diag.etapas[0]["memoria_mb"] >= 0
+    assert diag.records()[0]["pico_memoria_mb"] == round(diag.pico_memoria / 2**20, 3)
@@ -0,0 +1,45 @@
+"""RetCache: contagem de acertos/falhas, ordem LRU e descarte por max_bytes, com um loader falso."""
+import cnab240
+
+class _Loader:
+    def __init__(self):
+        self.chamadas = []
+
+    def __call__(self, dados):
+        self.chamadas.append(dados)
+        return {"conteudo": dados}
+
+def test_acerto_e_falha():
+    loader = _Loader()
+    cache = cnab240.RetCache(max_bytes=100, loader=loader)
+    obj, hit = cache.get_or_parse(b"a" * 10)
+    assert obj == {"conteudo": b"a" * 10} and not hit
+    obj2, hit = cache.get_or_parse(b"a" * 10)
+    assert hit and obj2 is obj
+    assert (cache.hits, cache.misses, len(cache), cache.total_bytes) == (1, 1, 1, 10)
+    assert loader.chamadas == [b"a" * 10]
+
+def test_descarta_o_menos_usado():
+    loader = _Loader()
+    cache = cnab240.RetCache(max_bytes=30, loader=loader)
+    a, b, c, d = (bytes([x]) * 10 for x in b"abcd")
+    for dados in (a, b, c):
+        cache.get_or_parse(dados)
+    cache.get_or_parse(a)                  # "a" passa a ser o mais recente; "b" é o mais antigo
+    cache.get_or_parse(d)                  # 40 bytes > 30: descarta "b"
+    assert len(cache) == 3 and cache.total_bytes == 30
+    assert cache.get_or_parse(a)[1] and cache.get_or_parse(c)[1] and cache.get_or_parse(d)[1]
+    assert not cache.get_or_parse(b)[1]    # Voltou a ser analisado
+    assert loader.chamadas.count(b) == 2
+
+def test_item_maior_que_o_limite():
+    cache = cnab240.RetCache(max_bytes=30, loader=_Loader())
+    cache.get_or_parse(b"x" * 10)
+    grande = b"g" * 50
+    _, hit = cache.get_or_parse(grande)
+    assert not hit
+    # O item grande fica sozinho (é o último analisado); os demais são descartados
+    assert len(cache) == 1 and cache.total_bytes == 50
+    assert cache.get_or_parse(grande)[1]
+    cache.get_or_parse(b"y" * 10)
+    assert len(cache) == 1 and cache.total_bytes == 10
@@ -0,0 +1,89 @@
+"""Consultas do RetIndex (filtro, paginação e resumo) comparadas com filtros diretos do pandas."""
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cnab240
+
+def _df():
+    linhas = [
+        # Doc Empresa, Data Pagamento, Data Efetivação, Ocorrência, Valor Nominal, Valor Efetivo
+        ("NF100", "01022025", "01022025", "00", 10.0, 10.0),
+        ("NF101", "01022025", "00000000", "BD", 20.0, 0.0),
+        ("NF200", "02022025", "03022025", "00", 30.5, 30.5),
+        ("ABC", "02022025", "", "AB", 40.0, 0.0),
+        ("NF1", "03022025", "05022025", "00", 50.25, 50.25),
+        ("", "03022025", "28022025", "00", 60.0, 60.0),
+        ("NF10", "04022025", "00000000", "AB", 70.0, 0.0),
+    ]
+    df = pd.DataFrame(linhas, columns=["Doc Empresa", "Data Pagamento", "Data Efetivação", "Ocorrência",
+                                       "Valor Nominal (R$)", "Valor Efetivo (R$)"])
+    pago = (df["Data Efetivação"] != "") & (df["Data Efetivação"] != "00000000")
+    df["Status"] = np.where(pago, "Pago", "Não Pago")
+    return df
+
+@pytest.fixture
+def indice():
+    return cnab240.RetIndex(_df())
+
+def test_sem_filtros(indice):
+    assert indice.filter().tolist() == list(range(7))
+    assert indice.categories("Status") == ["Não Pago", "Pago"]
+    assert indice.categories("Ocorrência") == ["00", "AB", "BD"]
+
+def test_periodo_inclui_a_data_final(indice):
+    posicoes = indice.filter(data_inicio=datetime.date(2025, 2, 1), data_fim=datetime.date(2025, 2, 5))
+    assert posicoes.tolist() == [0, 2, 4]
+    um_dia = indice.filter(data_inicio=datetime.date(2025, 2, 3), data_fim=datetime.date(2025, 2, 3))
+    assert um_dia.tolist() == [2]
+
+def test_periodo_aberto_exclui_sem_efetivacao(indice):
+    # Linhas com Data Efetivação vazia ou 00000000 (NaT) nunca entram num filtro de período
+    assert indice.filter(data_inicio=datetime.date(2025, 2, 3)).tolist() == [2, 4, 5]
+    assert indice.filter(data_fim=datetime.date(2025, 2, 3)).tolist() == [0, 2]
+    assert indice.filter(data_inicio=datetime.date(2025, 3, 1)).tolist() == []
+
+def test_prefixo_do_doc_empresa(indice):
+    assert indice.filter(doc_empresa="NF1").tolist() == [0, 1, 4, 6]
+    assert indice.filter(doc_empresa="NF10").tolist() == [0, 1, 6]
+    assert indice.filter(doc_empresa="NF2").tolist() == [2]
+    assert indice.filter(doc_empresa="X").tolist() == []
+
+def test_status_ocorrencia_combinados(indice):
+    assert indice.filter(status=["Não Pago"]).tolist() == [1, 3, 6]
+    assert indice.filter(ocorrencias=["AB", "BD"]).tolist() == [1, 3, 6]
+    assert indice.filter(status=["Não Pago"], ocorrencias=["AB"]).tolist() == [3, 6]
+    assert indice.filter(status=["Pago"], ocorrencias=["00"], doc_empresa="NF").tolist() == [0, 2, 4]
+    assert indice.filter(status=["Pago"], ocorrencias=["AB"]).tolist() == []
+
+def test_filtros_equivalem_ao_pandas(indice):
+    df = _df()
+    datas = pd.to_datetime(df["Data Efetivação"], format="%d%m%Y", errors="coerce")
+    esperado = df.index[df["Status"].isin(["Pago"]) & df["Doc Empresa"].str.startswith("NF")
+                        & (datas >= "2025-02-02") & (datas <= "2025-02-28")]
+    obtido = indice.filter(status=["Pago"], doc_empresa="NF", data_inicio=datetime.date(2025, 2, 2),
+                           data_fim=datetime.date(2025, 2, 28))
+    assert obtido.tolist() == esperado.tolist()
+
+def test_paginas(indice):
+    posicoes = indice.filter()
+    assert indice.page(posicoes, 1, 3).index.tolist() == [0, 1, 2]
+    assert indice.page(posicoes, 3, 3).index.tolist() == [6]
+    assert indice.page(posicoes, 4, 3).empty
+    filtradas = indice.filter(status=["Não Pago"])
+    assert indice.page(filtradas, 2, 2)["Doc Empresa"].tolist() == ["NF10"]
+
+def test_resumo_igual_ao_groupby(indice):
+    posicoes = indice.filter(ocorrencias=["00", "AB"])
+    df = _df().iloc[posicoes]
+    data = pd.to_datetime(df["Data Pagamento"], format="%d%m%Y").dt.date
+    esperado = df.groupby([data, "Status"]).agg(
+        Quantidade=("Status", "size"),
+        **{"Valor Nominal (R$)": ("Valor Nominal (R$)", "sum"),
+           "Valor Efetivo (R$)": ("Valor Efetivo (R$)", "sum")},
+    ).reset_index()
+    resumo = indice.summary(posicoes)
+    resumo["Status"] = resumo["Status"].astype(str)
+    pd.testing.assert_frame_equal(resumo, esperado, check_dtype=False)
@@ -0,0 +1,147 @@
+"""parse_ret_columns e parse_ret_stream comparados com o parser linha a linha (parse_ret_file)."""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cnab240
+from conftest import COMPANY, make_transactions
+
+CAMPOS = {nome: (inicio, fim) for nome, inicio, fim in cnab240.RET_SEGMENTO_A_CAMPOS}
+
+def _campo(linha, nome, valor):
+    inicio, fim = CAMPOS[nome]
+    return linha[:inicio] + valor.ljust(fim - inicio)[:fim - inicio] + linha[fim:]
+
+def _retorno(n=60):
+    """Linhas de um retorno: a remessa com efetivação preenchida em parte dos Segmentos A."""
+    linhas = []
+    for i, linha in enumerate(cnab240.generate_cnab_file(COMPANY, make_transactions(n)).split("\n")):
+        if linha[7] == "3" and linha[13] == "A":
+            if i % 3:
+                linha = _campo(linha, "Data Efetivação", linha[93:101])
+                linha = _campo(linha, "Valor Efetivo (R$)", linha[119:134])
+                linha = _campo(linha, "Ocorrência", "00")
+            else:
+                linha = _campo(linha, "Data Efetivação", "00000000")
+                linha = _campo(linha, "Ocorrência", "AB")
+        linhas.append(linha)
+    return linhas
+
+def _casos_especiais(linhas):
+    """Variações das linhas de detalhe que o parser original trata de forma particular."""
+    a = [i for i, linha in enumerate(linhas) if linha[7] == "3" and linha[13] == "A"]
+    linhas = list(linhas)
+    linhas[a[0]] = linhas[a[0]][:150]                                     # Curta: completada com espaços
+    linhas[a[1]] = linhas[a[1]][:100]                                     # Curta, sem o valor
+    linhas[a[2]] = linhas[a[2]] + "EXCEDENTE" * 3                         # Longa: o excesso é ignorado
+    linhas[a[3]] = _campo(linhas[a[3]], "Valor Nominal (R$)", "00000000012A456")   # Valor inválido
+    linhas[a[4]] = _campo(linhas[a[4]], "Valor Nominal (R$)", "-00000000001234")   # Com sinal
+    linhas[a[5]] = _campo(linhas[a[5]], "Valor Efetivo (R$)", "+00000000001234")
+    linhas[a[6]] = _campo(linhas[a[6]], "Valor Nominal (R$)", "      1234     ")   # Com espaços
+    linhas[a[7]] = _campo(linhas[a[7]], "Valor Nominal (R$)", "000000000001_00")   # int() aceita "_"
+    linhas[a[8]] = _campo(linhas[a[8]], "Valor Nominal (R$)", "٠٠٠٠٠٠٠٠٠٠١٢٣٤٥")   # Dígitos não ASCII
+    linhas[a[9]] = _campo(linhas[a[9]], "Data Efetivação", "        ")
+    linhas[a[10]] = _campo(linhas[a[10]], "Doc Empresa", "AÇÃO Ñ")                  # latin-1
+    linhas.insert(a[11], "   ")                                                     # Linha em branco
+    return linhas
+
+def _texto_nao_latin1(linhas):
+    a = next(i for i, linha in enumerate(linhas) if linha[7] == "3" and linha[13] == "A")
+    linhas = list(linhas)
+    linhas[a] = _campo(linhas[a], "Doc Empresa", "日本語 €")
+    return linhas
+
+def _esperado(texto):
+    registros = cnab240.parse_ret_file(texto)
+    return pd.DataFrame(registros, columns=list(cnab240.parse_ret_columns("")))
+
+def _comparar(colunas, texto):
+    obtido = pd.DataFrame(colunas)
+    esperado = _esperado(texto)
+    assert list(obtido.columns) == list(esperado.columns)
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+
+QUEBRAS = {
+    "lf": "\n",
+    "crlf": "\r\n",
+    "cr": "\r",
+    "vt": "\x0b",
+    "ff": "\x0c",
+    "fs": "\x1c",
+    "gs": "\x1d",
+    "rs": "\x1e",
+    "nel": "\x85",
+    "ls": "\u2028",
+    "ps": "\u2029",
+}
+
+CONTEUDOS = {
+    "normal": _retorno,
+    "especiais": lambda: _casos_especiais(_retorno()),
+    "nao_latin1": lambda: _texto_nao_latin1(_casos_especiais(_retorno())),
+}
+
+@pytest.mark.parametrize("quebra", list(QUEBRAS))
+@pytest.mark.parametrize("conteudo", list(CONTEUDOS))
+def test_parse_ret_columns(conteudo, quebra):
+    texto = QUEBRAS[quebra].join(CONTEUDOS[conteudo]())
+    _comparar(cnab240.parse_ret_columns(texto), texto)
+
+@pytest.mark.parametrize("batch_bytes", [1, 250, 1000, 16 * 1024 * 1024])
+@pytest.mark.parametrize("quebra", list(QUEBRAS))
+@pytest.mark.parametrize("conteudo", list(CONTEUDOS))
+def test_parse_ret_stream(conteudo, quebra, batch_bytes):
+    texto = QUEBRAS[quebra].join(CONTEUDOS[conteudo]())
+    for encoding in ("utf-8", "latin1"):
+        try:
+            dados = texto.encode(encoding)
+        except UnicodeEncodeError:
+            continue
+        # O stream decide a codificação como decode_ret_bytes: o texto de referência é o decodificado
+        _comparar(cnab240.parse_ret_stream(dados, batch_bytes), cnab240.decode_ret_bytes(dados))
+
+def test_parse_ret_stream_caminho(tmp_path):
+    texto = "\r\n".join(_casos_especiais(_retorno()))
+    arquivo = tmp_path / "retorno.ret"
+    arquivo.write_bytes(texto.encode("utf-8"))
+    _comparar(cnab240.parse_ret_stream(str(arquivo), batch_bytes=500), texto)
+    vazio = tmp_path / "vazio.ret"
+    vazio.write_bytes(b"")
+    _comparar(cnab240.parse_ret_stream(str(vazio)), "")
+
+def test_ret_dataframe_status_e_valores():
+    df = cnab240.ret_dataframe("\r\n".join(_retorno(6)).encode("latin1"))
+    assert list(df["Status"]) == ["Pago", "Pago", "Não Pago", "Pago", "Pago", "Não Pago"]
+    assert df["Valor Nominal (R$)"].tolist() == [1234.56, 7.0, 12.5, 0.1, 99999.99, 1.0]
+    assert np.array_equal(df["Valor Efetivo (R$)"] > 0, df["Status"] == "Pago")
+
+@pytest.mark.parametrize("quebra", ["\n", "\r\n", "\r"])
+def test_blocos_limitados_pelo_tamanho(quebra):
+    """Os blocos terminam em fim de linha e não crescem além de batch_bytes + uma linha."""
+    dados = quebra.join(_retorno(200)).encode("latin1")
+    blocos = list(cnab240._iter_ret_chunks(io.BytesIO(dados), 1000))
+    assert b"".join(blocos) == dados
+    assert max(len(b) for b in blocos) <= 1000 + 242
+    assert all(b.endswith(quebra.encode()) for b in blocos[:-1])
+
+# Colunas do parse_ret_file original, na mesma ordem: a referência para todos os parsers
+COLUNAS_RETORNO = [
+    "Código Banco", "Lote", "Tipo Registro", "Segmento", "Tipo Movimento", "Instrução Movimento",
+    "Câmara Centralizadora", "Doc Empresa", "Data Pagamento", "Moeda", "Qtde Moeda", "Valor Nominal (R$)",
+    "Doc Banco", "Data Efetivação", "Valor Efetivo (R$)", "Tipo de Conta", "Código Finalidade", "Ocorrência",
+    "Status",
+]
+
+def test_colunas_do_retorno():
+    texto = "\r\n".join(_retorno(3))
+    assert list(cnab240.parse_ret_file(texto)[0]) == COLUNAS_RETORNO
+    assert list(cnab240.parse_ret_columns(texto)) == COLUNAS_RETORNO
+    assert list(cnab240.ret_dataframe(texto.encode("latin1")).columns) == COLUNAS_RETORNO
+
+def test_campos_da_conciliacao():
+    texto = "\r\n".join(_retorno(3))
+    colunas = cnab240.parse_ret_stream(texto.encode("latin1"), campos=cnab240.RET_CAMPOS_CONCILIACAO)
+    assert list(colunas) == COLUNAS_RETORNO[:3] + ["Nº Registro"] + COLUNAS_RETORNO[3:]
+    assert colunas["Nº Registro"].tolist() == ["00001", "00003", "00005"]
@@ -0,0 +1,179 @@
+"""Importação de transações em lote (CSV/XLSX) e validação vetorizada da planilha."""
+import datetime
+import io
+
+import pandas as pd
+import pytest
+
+import cnab240
+
+CABECALHO = ["data_pagamento", "valor_pagamento", "forma_iniciacao", "tipo_doc_fav", "doc_fav", "chave_pix"]
+
+VALIDA = {
+    "data_pagamento": "10/03/2025", "valor_pagamento": "1234,56", "forma_iniciacao": "03",
+    "tipo_doc_fav": "1", "doc_fav": "01234567890", "chave_pix": "",
+}
+
+def _csv(linhas, sep=";", colunas=CABECALHO):
+    texto = "\n".join(sep.join(linha) for linha in [colunas] + linhas)
+    return io.BytesIO(texto.encode("utf-8"))
+
+def _tabela(**alteracoes):
+    """Uma transação válida (tipo 03, CPF) com os campos alterados, já normalizada."""
+    linha = {**VALIDA, **alteracoes}
+    return cnab240.read_transactions_table(_csv([list(linha.values())], colunas=list(linha)), "lote.csv")
+
+def _erros(df):
+    return [tuple(erro) for erro in cnab240.validate_transactions(df).itertuples(index=False)]
+
+# ====================== LEITURA ======================
+@pytest.mark.parametrize("sep", [";", ","])
+def test_detecta_separador(sep):
+    linhas = [["10/03/2025", "1234.56", "03", "1", "01234567890", ""],
+              ["11/03/2025", "7", "01", "2", "00123456000199", "chave@pix"]]
+    if sep == ";":
+        linhas[0][1] = "1234,56"
+    df = cnab240.read_transactions_table(_csv(linhas, sep=sep), "lote.csv")
+    assert list(df.columns) == cnab240.TRANSACTION_COLUMNS
+    assert df["valor_pagamento"].tolist() == [linhas[0][1], "7"]
+    assert df["chave_pix"].tolist() == ["", "chave@pix"]
+    assert df["fav_banco"].tolist() == ["", ""]
+
+def test_latin1_e_cabecalho_com_espacos():
+    texto = " DATA_PAGAMENTO ;valor_pagamento;forma_iniciacao;tipo_doc_fav;doc_fav;fav_nome\n"
+    texto += "10/03/2025;1,00;3;1;01234567890;JOSÉ\n"
+    df = cnab240.read_transactions_table(io.BytesIO(texto.encode("latin1")), "lote.CSV")
+    assert df.loc[0, "fav_nome"] == "JOSÉ"
+    assert df.loc[0, "data_pagamento"] == datetime.date(2025, 3, 10)
+
+def test_caminho_em_disco(tmp_path):
+    caminho = tmp_path / "lote.csv"
+    caminho.write_bytes(_csv([list(VALIDA.values())]).getvalue())
+    df = cnab240.read_transactions_table(caminho, caminho.name)
+    assert df.loc[0, "doc_fav"] == "01234567890"
+
+def test_coluna_obrigatoria_ausente():
+    with pytest.raises(ValueError, match="Colunas obrigatórias ausentes: doc_fav$"):
+        cnab240.read_transactions_table(_csv([["10/03/2025", "1", "03", "1"]], colunas=CABECALHO[:4]), "lote.csv")
+
+@pytest.mark.parametrize("data, esperado", [
+    ("10/03/2025", datetime.date(2025, 3, 10)),
+    ("01/12/2025", datetime.date(2025, 12, 1)),    # dd/mm antes do ISO: não vira 12 de janeiro
+    ("2025-03-10", datetime.date(2025, 3, 10)),
+    ("2025-03-10 00:00:00", datetime.date(2025, 3, 10)),
+    ("31/02/2025", None),
+    ("amanhã", None),
+    ("", None),
+])
+def test_datas_csv(data, esperado):
+    valor = _tabela(data_pagamento=data).loc[0, "data_pagamento"]
+    assert (valor is None or pd.isna(valor)) if esperado is None else valor == esperado
+
+def test_xlsx_datas_e_zeros_a_esquerda():
+    origem = pd.DataFrame({
+        "data_pagamento": [datetime.datetime(2025, 3, 10), "11/03/2025", "2025-03-12"],
+        "valor_pagamento": ["1234,56", "7", "0,01"],
+        "forma_iniciacao": ["03 - CPF/CNPJ", "3", "05"],
+        "tipo_doc_fav": ["1 - CPF", "2", "1"],
+        "doc_fav": ["01234567890", "00123456000199", "00000000191"],
+        "fav_agencia": ["", "", "00012"],
+    })
+    arquivo = io.BytesIO()
+    origem.to_excel(arquivo, index=False)
+    arquivo.seek(0)
+    df = cnab240.read_transactions_table(arquivo, "Lote.XLSX")
+    assert df["data_pagamento"].tolist() == [datetime.date(2025, 3, d) for d in (10, 11, 12)]
+    assert df["forma_iniciacao"].tolist() == ["03", "03", "05"]
+    assert df["tipo_doc_fav"].tolist() == ["1", "2", "1"]
+    assert df["doc_fav"].tolist() == ["01234567890", "00123456000199", "00000000191"]
+    assert df["fav_agencia"].tolist() == ["", "", "00012"]
+
+@pytest.mark.parametrize("forma, esperado", [
+    ("03 - CPF/CNPJ", "03"), ("3", "03"), ("03", "03"), (" 5 ", "05"), ("01 - Chave PIX (Telefone)", "01"),
+])
+def test_normaliza_forma_iniciacao(forma, esperado):
+    assert _tabela(forma_iniciacao=forma).loc[0, "forma_iniciacao"] == esperado
+
+def test_normaliza_tipo_doc():
+    assert _tabela(tipo_doc_fav="2 - CNPJ").loc[0, "tipo_doc_fav"] == "2"
+
+def test_mantem_zeros_a_esquerda_no_csv():
+    df = _tabela(doc_fav="00000000191", fav_conta="000123", fav_ispb="00000000")
+    assert df.loc[0, ["doc_fav", "fav_conta", "fav_ispb"]].tolist() == ["00000000191", "000123", "00000000"]
+
+# ====================== VALIDAÇÃO ======================
+def test_transacao_valida_sem_erros():
+    erros = cnab240.validate_transactions(_tabela())
+    assert erros.empty
+    assert list(erros.columns) == ["Linha", "Campo", "Erro"]
+
+def test_linha_conta_cabecalho():
+    linhas = [list(VALIDA.values()), list({**VALIDA, "doc_fav": "123"}.values()), list(VALIDA.values()),
+              list({**VALIDA, "data_pagamento": "x"}.values())]
+    df = cnab240.read_transactions_table(_csv(linhas), "lote.csv")
+    assert _erros(df) == [(3, "doc_fav", "CPF deve ter 11 dígitos"), (5, "data_pagamento", "Data inválida")]
+
+@pytest.mark.parametrize("alteracoes, campo, erro", [
+    ({"data_pagamento": "32/01/2025"}, "data_pagamento", "Data inválida"),
+    ({"valor_pagamento": "12,345"}, "valor_pagamento", "Valor inválido (use 1234,56)"),
+    ({"valor_pagamento": "1.234,56"}, "valor_pagamento", "Valor inválido (use 1234,56)"),
+    ({"valor_pagamento": "-5"}, "valor_pagamento", "Valor inválido (use 1234,56)"),
+    ({"valor_pagamento": ""}, "valor_pagamento", "Valor inválido (use 1234,56)"),
+    ({"valor_pagamento": "0,00"}, "valor_pagamento", "Valor zerado"),
+    ({"valor_pagamento": "000"}, "valor_pagamento", "Valor zerado"),
+    ({"forma_iniciacao": "06"}, "forma_iniciacao", "Forma de iniciação deve ser 01 a 05"),
+    ({"forma_iniciacao": "PIX"}, "forma_iniciacao", "Forma de iniciação deve ser 01 a 05"),
+    ({"tipo_doc_fav": "3"}, "tipo_doc_fav", "Tipo de documento deve ser 1 (CPF) ou 2 (CNPJ)"),
+    ({"doc_fav": "012345678-9"}, "doc_fav", "CPF/CNPJ deve conter somente números"),
+    ({"doc_fav": "0123456789"}, "doc_fav", "CPF deve ter 11 dígitos"),
+    ({"tipo_doc_fav": "2"}, "doc_fav", "CNPJ deve ter 14 dígitos"),
+    ({"forma_iniciacao": "01"}, "chave_pix", "Chave PIX obrigatória para os tipos 01, 02 e 04"),
+    ({"forma_iniciacao": "02"}, "chave_pix", "Chave PIX obrigatória para os tipos 01, 02 e 04"),
+    ({"forma_iniciacao": "04"}, "chave_pix", "Chave PIX obrigatória para os tipos 01, 02 e 04"),
+    ({"fav_ispb": "1234567"}, "fav_ispb", "ISPB deve ter 8 dígitos"),
+    ({"fav_ispb": "1234567A"}, "fav_ispb", "ISPB deve ter 8 dígitos"),
+])
+def test_regras(alteracoes, campo, erro):
+    assert _erros(_tabela(**alteracoes)) == [(2, campo, erro)]
+
+@pytest.mark.parametrize("alteracoes", [
+    {"valor_pagamento": "0,01"}, {"valor_pagamento": "1.5"}, {"valor_pagamento": " 7 "},
+    {"forma_iniciacao": "01", "chave_pix": "+5511999999999"},
+    {"tipo_doc_fav": "2", "doc_fav": "00123456000199"},
+    {"fav_ispb": "00000000"},
+])
+def test_regras_aceitam(alteracoes):
+    assert _erros(_tabela(**alteracoes)) == []
+
+BANCARIO = {"forma_iniciacao": "05", "fav_banco": "001", "fav_agencia": "00012", "fav_conta": "000000123456"}
+
+def test_tipo_05_completo():
+    assert _erros(_tabela(**BANCARIO)) == []
+
+@pytest.mark.parametrize("campo, tamanho, invalido", [
+    ("fav_banco", 3, "0001"), ("fav_banco", 3, ""), ("fav_banco", 3, "1A"),
+    ("fav_agencia", 5, "000123"), ("fav_agencia", 5, ""),
+    ("fav_conta", 12, "0000001234567"), ("fav_conta", 12, "12-3"),
+])
+def test_tipo_05_campos_bancarios(campo, tamanho, invalido):
+    df = _tabela(**{**BANCARIO, campo: invalido})
+    assert _erros(df) == [(2, campo, f"Obrigatório para o tipo 05 (até {tamanho} dígitos)")]
+
+def test_campos_bancarios_ignorados_fora_do_tipo_05():
+    assert _erros(_tabela(fav_banco="", fav_agencia="abc", fav_conta="")) == []
+
+def test_varios_erros_na_mesma_linha():
+    erros = _erros(_tabela(valor_pagamento="0", tipo_doc_fav="2", doc_fav="123", forma_iniciacao="05"))
+    assert erros == [
+        (2, "valor_pagamento", "Valor zerado"),
+        (2, "doc_fav", "CNPJ deve ter 14 dígitos"),
+        (2, "fav_banco", "Obrigatório para o tipo 05 (até 3 dígitos)"),
+        (2, "fav_agencia", "Obrigatório para o tipo 05 (até 5 dígitos)"),
+        (2, "fav_conta", "Obrigatório para o tipo 05 (até 12 dígitos)"),
+    ]
+
+def test_transactions_from_table():
+    registros = cnab240.transactions_from_table(_tabela(**BANCARIO))
+    assert registros[0]["fav_conta"] == "000000123456"
+    assert registros[0]["data_pagamento"] == datetime.date(2025, 3, 10)
+    assert list(registros[0]) == cnab240.TRANSACTION_COLUMNS